@@ -0,0 +1,177 @@
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+from _copy_file_structure import FileRecord, ScanIndex
+from _copy_for_prompt import PromptConfig, build_prompt, collect_files, rank_files
+from _copy_cache import ContentCache
+from _copy_sinks import open_sink
+from _copy_stats import DEFAULT_SLOWEST_FILES, RunStats
+
+# Change-scoped builds need one baseline per job, which shared scans don't keep
+CONFIG_FIELDS = {f.name for f in fields(PromptConfig)} - {"since", "since_last_run"}
+
+
+@dataclass
+class BatchJob:
+    """One prompt of a batch manifest: its options and where to write it."""
+    name: str
+    config: PromptConfig
+    output: str
+
+
+@dataclass
+class JobResult:
+    """What a batch job wrote, for reporting in the parent process."""
+    name: str
+    output: str
+    files: int
+    chars: int
+    duplicates: int
+    errors: list[tuple[str, str]]
+    # Why nothing was written, when the prompt could not be built
+    error: Optional[str] = None
+
+
+def load_manifest(path, defaults: PromptConfig) -> list[BatchJob]:
+    """
+    Reads a JSON manifest: a list of jobs, or {"defaults": {...}, "jobs": [...]}.
+    Each job is an object of PromptConfig field names plus "output" and an
+    optional "name"; unset fields come from "defaults", then from defaults.
+    """
+    import json
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("jobs"), list):
+        raise ValueError(f"{path}: expected a list of jobs or an object with \"jobs\"")
+
+    shared = manifest.get("defaults", {})
+    unknown = set(shared) - CONFIG_FIELDS
+    if unknown:
+        raise ValueError(f"{path}: unknown defaults {sorted(unknown)}")
+    defaults = replace(defaults, **shared)
+
+    jobs = []
+    for number, job in enumerate(manifest["jobs"], 1):
+        if not isinstance(job, dict):
+            raise ValueError(f"{path}: job {number} is not an object")
+        options = dict(job)
+        name = str(options.pop("name", number))
+        output = options.pop("output", None)
+        if not output:
+            raise ValueError(f"{path}: job {name} has no output")
+        unknown = set(options) - CONFIG_FIELDS
+        if unknown:
+            raise ValueError(f"{path}: job {name} has unknown options {sorted(unknown)}")
+        jobs.append(BatchJob(name, replace(defaults, **options), output))
+    return jobs
+
+
+def group_roots(jobs: list[BatchJob]) -> list[tuple[str, list[BatchJob]]]:
+    """
+    Groups jobs by the outermost base_dir containing theirs, so nested roots
+    (e.g. "." and "client") share one group. Groups never overlap on disk;
+    jobs keep their manifest order within a group.
+    """
+    groups: dict[str, list[BatchJob]] = {}
+    by_depth = sorted(enumerate(jobs), key=lambda item: len(
+        os.path.abspath(item[1].config.base_dir)))
+    for order, job in by_depth:
+        base = os.path.abspath(job.config.base_dir)
+        root = next((root for root in groups
+                     if base == root or base.startswith(root.rstrip(os.sep) + os.sep)), base)
+        groups.setdefault(root, []).append((order, job))
+    return [(root, [job for _, job in sorted(group, key=lambda item: item[0])])
+            for root, group in groups.items()]
+
+
+def build_root(root, jobs: list[BatchJob], cache_dir=None, load_jobs=1, slowest=DEFAULT_SLOWEST_FILES) -> tuple[list[JobResult], RunStats]:
+    """
+    Builds every job of one root group. Jobs with the same patterns share one
+    walk, and every file is read and cleaned once per set of cleaning options,
+    however many jobs include it; each job then gets its own view of the
+    shared records, so dedupe marks and budget trimming stay per job.
+    """
+    stats = RunStats(slowest)
+    cache = ContentCache(cache_dir) if cache_dir else None
+    scans: dict[tuple, list[str]] = {}
+    shared: dict[tuple, ScanIndex] = {}
+    job_records: list[list[FileRecord]] = []
+    try:
+        for job in jobs:
+            config = job.config
+            scan = (config.base_dir, tuple(config.include_files), tuple(config.exclude_files),
+                    tuple(config.include_content), tuple(config.exclude_content),
+                    config.case_sensitive, config.source, config.follow_symlinks)
+            if scan not in scans:
+                with stats.phase("find_files"):
+                    scans[scan] = list(collect_files(config, stats))
+            files = scans[scan]
+            if config.relevant_to is not None:
+                files, _ = rank_files(config, files, stats)
+            options = (config.shorten_funcs, config.max_file_bytes)
+            if options not in shared:
+                shared[options] = ScanIndex(root, config.shorten_funcs, cache=cache, stats=stats,
+                                            max_file_bytes=config.max_file_bytes)
+            index = shared[options]
+            records = (index.add(os.path.join(config.base_dir, file)) for file in files)
+            job_records.append([record for record in records if record is not None])
+
+        with stats.phase("load"):
+            for index in shared.values():
+                index.load_all(load_jobs)
+        if cache is not None:
+            cache.commit()
+
+        results = []
+        for job, records in zip(jobs, job_records):
+            config = job.config
+            index = ScanIndex(config.base_dir, config.shorten_funcs, stats=stats,
+                              max_file_bytes=config.max_file_bytes)
+            for record in records:
+                path = os.path.relpath(record.abs_path, config.base_dir)
+                index.records[path] = replace(record, path=path)
+            errors = [(record.path, record.error) for record in index.errors]
+            try:
+                with open_sink(job.output, chunked=bool(config.chunk_size)) as sink:
+                    result = build_prompt(config, sink, index, release=False)
+            except ValueError as e:
+                # One job's bad options must not cost the rest of the batch
+                results.append(JobResult(job.name, job.output, len(index), 0, 0, errors, str(e)))
+                continue
+            results.append(JobResult(
+                job.name, job.output, len(index), result.chars, len(result.duplicates), errors))
+    finally:
+        if cache is not None:
+            cache.close()
+    stats.count("batch_jobs", len(jobs))
+    stats.count("files_shared", sum(len(records) for records in job_records)
+                - sum(len(index) for index in shared.values()))
+    return results, stats
+
+
+def run_batch(jobs: list[BatchJob], workers=1, cache_dir=None, slowest=DEFAULT_SLOWEST_FILES, stats: Optional[RunStats] = None) -> list[JobResult]:
+    """
+    Builds all jobs, one root group at a time or, with workers > 1 and several
+    groups, one group per process. Results are returned in manifest order.
+    """
+    if stats is None:
+        stats = RunStats(slowest)
+    groups = group_roots(jobs)
+    if workers <= 1 or len(groups) < 2:
+        built = [build_root(root, group, cache_dir, workers, slowest)
+                 for root, group in groups]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+            futures = [pool.submit(build_root, root, group, cache_dir, 1, slowest)
+                       for root, group in groups]
+            built = [future.result() for future in futures]
+
+    by_job = {}
+    for (_, group), (results, group_stats) in zip(groups, built):
+        stats.merge(group_stats)
+        for job, result in zip(group, results):
+            by_job[id(job)] = result
+    return [by_job[id(job)] for job in jobs]
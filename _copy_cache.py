@@ -0,0 +1,120 @@
+import os
+import time
+from typing import Optional
+
+CACHE_FILENAME = "copy_for_prompt.sqlite3"
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+# Bump whenever the entries table changes; older tables are dropped
+SCHEMA_VERSION = 3
+
+
+class ContentCache:
+    """
+    Persistent SQLite cache of cleaned file content.
+
+    Entries are keyed by (path, cleaning options) and are only valid while the
+    file's mtime_ns and size are unchanged. Each entry also stores the digest
+    of its content, so duplicate detection never has to re-read or re-hash.
+    The least recently used entries are evicted once the stored content
+    exceeds max_bytes. Writes are buffered until commit, so processes
+    sharing the cache only hold its write lock for one short transaction
+    each.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = []
+        self._pending = []
+        import sqlite3
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS entries")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT NOT NULL,
+                options TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                content TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                tokens INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (path, options)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+    def get(self, path, mtime_ns, size, options) -> Optional[tuple[str, int, int, str]]:
+        """Returns (content, length, tokens, digest) if a fresh entry exists for the file."""
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, content, length, tokens, digest FROM entries WHERE path = ? AND options = ?",
+            (path, options)).fetchone()
+        if row is None or row[0] != mtime_ns or row[1] != size:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append((path, options))
+        return row[2], row[3], row[4], row[5]
+
+    def get_content(self, path, mtime_ns, size, options) -> Optional[str]:
+        """Returns only the content of a fresh entry, without counting a hit."""
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, content FROM entries WHERE path = ? AND options = ?",
+            (path, options)).fetchone()
+        if row is None or row[0] != mtime_ns or row[1] != size:
+            return None
+        return row[2]
+
+    def put(self, path, mtime_ns, size, options, content, tokens=0, digest=""):
+        self._pending.append(
+            (path, options, mtime_ns, size, digest, content, len(content), tokens,
+             len(content.encode('utf-8')), time.time()))
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        total = 0
+        stale = []
+        rows = self.conn.execute(
+            "SELECT rowid, bytes FROM entries ORDER BY last_used DESC")
+        for rowid, size in rows:
+            total += size
+            if total > self.max_bytes:
+                stale.append((rowid,))
+        if stale:
+            self.conn.executemany("DELETE FROM entries WHERE rowid = ?", stale)
+
+    def commit(self):
+        """Writes buffered entries, records hits as recently used, evicts over-budget entries and commits."""
+        # Only new entries can grow the cache past max_bytes, so commits that
+        # just record hits (every warm daemon build) skip the eviction scan
+        added = bool(self._pending)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._pending)
+        self._pending.clear()
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE entries SET last_used = ? WHERE path = ? AND options = ?",
+            ((now, path, options) for path, options in self._touched))
+        self._touched.clear()
+        if added:
+            self.evict()
+        self.conn.commit()
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,114 @@
+import os
+import json
+from typing import Optional
+from _copy_matcher import GlobMatcher
+from _copy_file_structure import ScanIndex
+
+# Directory under the cache dir holding one last-run manifest per base dir
+RUN_MANIFEST_DIR = "last_run"
+
+
+def run_manifest_path(cache_dir, base_dir) -> str:
+    import hashlib
+    key = hashlib.blake2b(os.path.abspath(base_dir).encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, RUN_MANIFEST_DIR, f"{key}.json")
+
+
+def load_run_manifest(path) -> Optional[dict]:
+    """Returns the manifest written at the end of the last run, or None if there is none."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_run_manifest(path, index: ScanIndex, previous: Optional[dict] = None, matcher: Optional[GlobMatcher] = None):
+    """
+    Writes {"options", "files": {path: [mtime_ns, size, digest]}} for the
+    indexed files. Digests are of cleaned content; files that were only
+    listed keep their previous entry while unchanged on disk. Previous
+    entries of files this run did not index are carried over while the
+    file exists or lies outside the matcher's patterns, so a narrower run
+    neither erases the baseline of a wider one nor hides its removals.
+    """
+    old = previous.get("files", {}) if previous else {}
+    if previous and previous.get("options") != index.cache_options:
+        # Digests of content cleaned with other options cannot be compared
+        old = {}
+    files = {entry_path: entry for entry_path, entry in old.items()
+             if entry_path not in index.records
+             and (os.path.exists(os.path.join(index.base_dir, entry_path))
+                  or matcher is not None and not path_matches(matcher, entry_path))}
+    for record in index:
+        if record.digest is not None:
+            files[record.path] = [record.mtime_ns, record.size, record.digest]
+        else:
+            entry = old.get(record.path)
+            if entry and entry[:2] == [record.mtime_ns, record.size]:
+                files[record.path] = entry
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({"options": index.cache_options, "files": files}, f)
+    os.replace(path + ".tmp", path)
+
+
+def limit_to(index: ScanIndex, changed):
+    """Leaves every record outside changed listed by name only."""
+    for record in index:
+        if record.path not in changed:
+            record.listed_only = True
+            record.content = None
+            record.length = 0
+
+
+def path_matches(matcher: GlobMatcher, path) -> bool:
+    """Whether find_files would match path: no excluded part, and the file or a parent dir included."""
+    parts = path.split(os.sep)
+    prefixes = [os.path.join(*parts[:i]) for i in range(1, len(parts) + 1)]
+    if any(matcher.excludes(prefix, name) for prefix, name in zip(prefixes, parts)):
+        return False
+    return matcher.includes_file(path) or any(
+        matcher.includes_dir(prefix, name) for prefix, name in zip(prefixes[:-1], parts))
+
+
+def changes_since_ref(index: ScanIndex, ref, matcher: GlobMatcher) -> tuple[set[str], list[str]]:
+    """Returns (changed, removed) paths between the git ref and the working tree."""
+    from _copy_git import changed_since
+    changed, removed = changed_since(index.base_dir, ref)
+    return changed, sorted(path for path in removed if path_matches(matcher, path))
+
+
+def changes_since_last_run(index: ScanIndex, manifest: Optional[dict], matcher: GlobMatcher, jobs=1) -> tuple[set[str], list[str]]:
+    """
+    Returns (changed, removed) paths compared to the last run's manifest.
+    Files whose mtime or size changed are loaded and compared by digest, so
+    files that were only touched stay unchanged. Without a manifest (or one
+    written with other cleaning options) every such file counts as changed.
+    Only removed files the matcher would have matched are returned.
+    """
+    entries = manifest.get("files", {}) if manifest else {}
+    comparable = manifest is not None and manifest.get("options") == index.cache_options
+    changed = set()
+    suspects = []
+    for record in index:
+        entry = entries.get(record.path)
+        if entry is None:
+            changed.add(record.path)
+        elif entry[:2] != [record.mtime_ns, record.size]:
+            if comparable:
+                suspects.append((record, entry[2]))
+            else:
+                changed.add(record.path)
+
+    if suspects:
+        limit_to(index, changed | {record.path for record, _ in suspects})
+        index.load_all(jobs)
+        for record, digest in suspects:
+            if record.digest != digest:
+                changed.add(record.path)
+
+    removed = sorted(path for path in entries if path not in index.records
+                     and not os.path.exists(os.path.join(index.base_dir, path))
+                     and path_matches(matcher, path))
+    return changed, removed
@@ -0,0 +1,60 @@
+import os
+from typing import Callable
+from _copy_file_structure import FileRecord
+
+DEFAULT_CHUNK_UNIT = "tokens"
+CHUNK_UNITS = ("chars", "tokens")
+
+
+def pack_chunks(records: list[FileRecord], capacity: int, cost: Callable[[FileRecord], int]) -> list[list[FileRecord]]:
+    """
+    Packs records into the fewest chunks of at most capacity with
+    first-fit decreasing. Directories whose files fit in one chunk are packed
+    as a single item so they stay together; larger ones are split into their
+    subdirectories, then files. A file larger than capacity gets a chunk of
+    its own. Chunks and the records in them are returned in path order.
+    """
+    order = {record.path: number for number, record in enumerate(records)}
+    costs = {record.path: cost(record) for record in records}
+    items = split_dirs(records, costs, capacity)
+
+    bins: list[tuple[int, list[FileRecord]]] = []
+    for size, group in sorted(items, key=lambda item: -item[0]):
+        for number, (used, chunk) in enumerate(bins):
+            if used + size <= capacity:
+                chunk.extend(group)
+                bins[number] = (used + size, chunk)
+                break
+        else:
+            bins.append((size, list(group)))
+
+    chunks = [sorted(chunk, key=lambda record: order[record.path]) for _, chunk in bins]
+    return sorted(chunks, key=lambda chunk: order[chunk[0].path])
+
+
+def split_dirs(records: list[FileRecord], costs: dict[str, int], capacity: int) -> list[tuple[int, list[FileRecord]]]:
+    """Returns (cost, records) items: whole directories where they fit, else their parts."""
+    items = []
+    # (records, depth of the directory they share)
+    pending = [(records, 0)]
+    while pending:
+        group, depth = pending.pop()
+        total = sum(costs[record.path] for record in group)
+        if total <= capacity:
+            items.append((total, group))
+            continue
+        files, dirs = [], {}
+        for record in group:
+            parts = record.path.split(os.sep)
+            if len(parts) > depth + 1:
+                dirs.setdefault(parts[depth], []).append(record)
+            else:
+                files.append(record)
+        if not dirs:
+            # Only files left: pack each on its own
+            items.extend((costs[record.path], [record]) for record in group)
+            continue
+        pending.extend((members, depth + 1) for members in dirs.values())
+        if files:
+            pending.append((files, depth))
+    return items
@@ -0,0 +1,448 @@
+import re
+import time
+from typing import Optional
+
+# Every cleaner here is a single-pass lexer: each input character is visited a
+# bounded number of times, so cleaning time is linear in the file size
+# whatever the content. Code, strings and comments are matched by compiled
+# regexes with possessive quantifiers, which cannot backtrack; Python code
+# only runs where a token needs more context than they have, such as a JS
+# slash after a keyword or a logging call nested deeper than its pattern.
+
+LOGGING_FUNCS = frozenset({
+    "info", "debug", "error", "warning", "critical", "exception", "log",
+    "basicConfig", "getLogger", "disable", "shutdown",
+})
+# The word-boundary check follows the literal so searches keep its fast prefix scan
+LOGGING_CALL = re.compile(
+    r'logging(?<!\wlogging)\.(?:' + '|'.join(sorted(LOGGING_FUNCS)) + r')\s*\(')
+
+JS_EXTENSIONS = (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx")
+BLOCK_COMMENT_EXTENSIONS = (".css", ".scss", ".less")
+NO_COMMENT_EXTENSIONS = (".md", ".json")
+
+# Python string bodies after the opening quote, through the closing quote.
+# Unterminated strings run to the end of the line (or file, when triple-quoted).
+PY_STRING_BODY = {
+    "'''": re.compile(r"[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*(?:''')?", re.DOTALL),
+    '"""': re.compile(r'[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*(?:""")?', re.DOTALL),
+    "'": re.compile(r"[^'\\\n]*(?:\\.[^'\\\n]*)*'?", re.DOTALL),
+    '"': re.compile(r'[^"\\\n]*(?:\\.[^"\\\n]*)*"?', re.DOTALL),
+}
+PY_STRING_START = r"'''|\"\"\"|'|\""
+# Whole Python strings, quotes included, with the same bodies
+PY_STRING = "|".join(quote + "(?:" + PY_STRING_BODY[quote].pattern + ")" for quote in PY_STRING_BODY)
+PY_LOGGING_SPECIAL = re.compile(PY_STRING_START + r"|" + LOGGING_CALL.pattern)
+PY_CALL_SPECIAL = re.compile(r"[()#]|" + PY_STRING_START)
+PY_SHORTEN_SPECIAL = re.compile(
+    r"#|" + PY_STRING_START + r"|^[ \t]*(?:async[ \t]+)?(?:def|class)\b", re.MULTILINE)
+PY_SIGNATURE_SPECIAL = re.compile(r"[()\[\]{}:#]|" + PY_STRING_START)
+
+# Characters after which a "/" starts a regex literal rather than a division
+JS_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+JS_REGEX_KEYWORDS = frozenset({
+    "return", "typeof", "case", "do", "else", "in", "of", "new", "delete",
+    "void", "throw", "yield", "await", "instanceof",
+})
+JS_TEMPLATE_SPECIAL = re.compile(r"[/'\"`{}]")
+# String bodies after the opening quote; single-line ones stop before a newline
+JS_STRING_BODY = {
+    "'": re.compile(r"[^'\\\n]*+(?:\\.[^'\\\n]*+)*+'?", re.DOTALL),
+    '"': re.compile(r'[^"\\\n]*+(?:\\.[^"\\\n]*+)*+"?', re.DOTALL),
+}
+JS_MULTILINE_STRING_BODY = {
+    quote: re.compile(rf"[^{quote}\\]*+(?:\\.[^{quote}\\]*+)*+{quote}?", re.DOTALL)
+    for quote in "'\"`"
+}
+# Template text up to the closing backtick or a ${ substitution
+JS_TEMPLATE_TEXT = re.compile(r"[^`\\$]*+(?:(?:\\.|\$(?!\{))[^`\\$]*+)*+", re.DOTALL)
+# A regex literal after its opening slash, through the closing one
+JS_REGEX_BODY = re.compile(r"(?:[^\\\n/\[]++|\\.|\[(?:[^\\\n\]]++|\\.)*+\])*+/", re.DOTALL)
+JS_WORD_BEFORE = re.compile(r"[A-Za-z_$][\w$]*$")
+
+# Tokens the C-style comment stripper settles without leaving the regex
+# engine: code, strings, templates whose substitutions hold no braces, quotes
+# or slashes, and slashes whose meaning shows in the character before them
+# (or before one space). Any other slash or backtick ends a stretch of them.
+_JS_PRECEDER = "[" + re.escape("".join(sorted(JS_REGEX_PRECEDERS))) + "]"
+_JS_NOT_KEYWORD = "".join(rf"(?<!{word})(?<!{word}[ \t])" for word in sorted(JS_REGEX_KEYWORDS))
+_C_CODE_TOKEN = (
+    r"[^/'\"`]++"
+    r"|'(?:" + JS_STRING_BODY["'"].pattern + r")|\"(?:" + JS_STRING_BODY['"'].pattern + r")"
+    r"|`" + JS_TEMPLATE_TEXT.pattern + r"(?:\$\{[^{}`'\"/\\]*+\}" + JS_TEMPLATE_TEXT.pattern + r")*+`")
+_JS_CODE_TOKEN = (
+    _C_CODE_TOKEN
+    + r"|(?:(?<=[\w$)\]])|(?<=[\w$)\]][ \t]))" + _JS_NOT_KEYWORD + r"/(?![/*])"
+    + r"|(?:(?<=" + _JS_PRECEDER + r")|(?<=" + _JS_PRECEDER + r"[ \t]))/(?![/*])"
+    + JS_REGEX_BODY.pattern)
+_BLOCK_COMMENT = r"/\*(?:[^*]++|\*(?!/))*+(?:\*/)?"
+# By line_comments: a stretch of settled tokens and the comment following it
+C_CODE_PIECE = {
+    True: re.compile(r"((?:" + _JS_CODE_TOKEN + r")*+)(?://[^\n]*+|" + _BLOCK_COMMENT + r")?",
+                     re.DOTALL),
+    False: re.compile(r"((?:" + _C_CODE_TOKEN + r"|/(?!\*))*+)(?:" + _BLOCK_COMMENT + r")?",
+                      re.DOTALL),
+}
+
+# Code pieces of Python source, each with the comment following it left out
+PY_CODE_PIECE = re.compile(r"((?:[^#'\"]++|" + PY_STRING + r")*+)(?:#[^\n]*+)?", re.DOTALL)
+
+
+def _balanced(token: str, depth: int) -> str:
+    """Pattern for the text after "(" through its matching ")", nesting at most depth levels."""
+    inner = rf"(?:{token})*+"
+    for _ in range(depth):
+        inner = rf"(?:{token}|\({inner}\))*+"
+    return inner + r"\)"
+
+
+# Logging calls whose arguments nest parentheses at most this deep are removed
+# by a single regex; deeper or unbalanced ones fall back to the lexers
+LOGGING_CALL_DEPTH = 4
+# Code pieces of Python source without comments, each with the logging call
+# following it left out; a call the pattern cannot match is captured instead
+PY_CODE_PIECE_BEFORE_LOGGING = re.compile(
+    r"((?:[^l'\"]++|(?!" + LOGGING_CALL.pattern + r")l|" + PY_STRING + r")*+)"
+    r"(?:" + LOGGING_CALL.pattern + _balanced(r"[^()'\"]++|" + PY_STRING, LOGGING_CALL_DEPTH)
+    + r"|(l))?", re.DOTALL)
+LOGGING_CALL_BALANCED = re.compile(
+    LOGGING_CALL.pattern + _balanced(r"[^()'\"`]++|" + "|".join(
+        quote + "(?:" + JS_MULTILINE_STRING_BODY[quote].pattern + ")" for quote in "'\"`"),
+        LOGGING_CALL_DEPTH), re.DOTALL)
+
+# A # that starts a line or follows whitespace, and the same in a line with
+# quotes, matched after the code and strings before it
+HASH_COMMENT = re.compile(r"(?<!\S)#")
+HASH_COMMENT_AFTER_QUOTES = re.compile(
+    r"""((?:[^'"#]++|'(?:[^'\\]|\\.)*+'?|"(?:[^"\\]|\\.)*+"?|(?<=\S)#)*+)#""")
+# Parentheses and quotes inside the arguments of a logging call
+LOGGING_ARGS_SPECIAL = re.compile(r"[()'\"`]")
+
+
+def _cut(content: str, spans) -> str:
+    """Returns content without the given sorted, non-overlapping (start, end) spans."""
+    parts = []
+    last = 0
+    for start, end in spans:
+        parts.append(content[last:start])
+        last = end
+    parts.append(content[last:])
+    return "".join(parts)
+
+
+def _skip_python_string(content: str, i: int, quote: str) -> int:
+    """Returns the index just past a Python string whose opening quote ends at content[i]."""
+    return PY_STRING_BODY[quote].match(content, i).end()
+
+
+def _python_call_end(content: str, i: int) -> int:
+    """Returns the index past the parenthesis matching content[i], or -1 if unbalanced."""
+    depth = 0
+    while True:
+        m = PY_CALL_SPECIAL.search(content, i)
+        if m is None:
+            return -1
+        token = m.group()
+        i = m.end()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        elif token == "#":
+            i = content.find("\n", i)
+            if i == -1:
+                return -1
+        else:
+            i = _skip_python_string(content, i, token)
+
+
+def strip_python_comments(content: str) -> str:
+    """Removes # comments from Python source, skipping strings."""
+    return "".join(PY_CODE_PIECE.findall(content))
+
+
+def _strip_python_logging_calls(content: str) -> str:
+    """Removes logging calls from comment-free Python source one call at a time."""
+    spans = []
+    i = 0
+    while True:
+        m = PY_LOGGING_SPECIAL.search(content, i)
+        if m is None:
+            break
+        token = m.group()
+        if token in PY_STRING_BODY:
+            i = _skip_python_string(content, m.end(), token)
+        else:
+            end = _python_call_end(content, m.end() - 1)
+            if end == -1:
+                # Unbalanced: every later call would also run to the end
+                break
+            spans.append((m.start(), end))
+            i = end
+    return _cut(content, spans)
+
+
+def clean_python(content: str) -> str:
+    """Removes comments and logging calls from Python source, leaving strings intact."""
+    if '#' in content:
+        content = strip_python_comments(content)
+    if 'logging.' not in content:
+        return content
+    pieces = PY_CODE_PIECE_BEFORE_LOGGING.findall(content)
+    if any(call for _, call in pieces):
+        # A call nested too deep for the pattern, or unbalanced
+        return _strip_python_logging_calls(content)
+    return "".join(code for code, _ in pieces)
+
+
+def _signature_end(content: str, i: int) -> int:
+    """Returns the index past the ":" ending a def/class header, or -1 if there is none."""
+    depth = 0
+    while True:
+        m = PY_SIGNATURE_SPECIAL.search(content, i)
+        if m is None:
+            return -1
+        token = m.group()
+        i = m.end()
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth -= 1
+        elif token == ":":
+            if depth == 0:
+                return i
+        elif token == "#":
+            i = content.find("\n", i)
+            if i == -1:
+                return -1
+        else:
+            i = _skip_python_string(content, i, token)
+
+
+def shorten_python(content: str) -> str:
+    """Keeps only def/class signatures (with their indentation), skipping strings and comments."""
+    signatures = []
+    i = 0
+    while True:
+        m = PY_SHORTEN_SPECIAL.search(content, i)
+        if m is None:
+            break
+        token = m.group()
+        if token == "#":
+            i = content.find("\n", m.end())
+            if i == -1:
+                break
+        elif token in PY_STRING_BODY:
+            i = _skip_python_string(content, m.end(), token)
+        else:
+            end = _signature_end(content, m.end())
+            if end == -1:
+                break
+            signatures.append(content[m.start():end])
+            i = end
+    return re.sub(r'\n+', '\n', "\n".join(signatures)).strip()
+
+
+def _skip_regex(content: str, i: int) -> int:
+    """Returns the index past a JS regex literal at content[i], or -1 if it is unterminated."""
+    m = JS_REGEX_BODY.match(content, i + 1)
+    return -1 if m is None else m.end()
+
+
+def _slash_end(content: str, i: int) -> int:
+    """Returns the index past the "/" at content[i], or past the regex literal it starts."""
+    before = content[max(0, i - 16):i].rstrip()
+    word = JS_WORD_BEFORE.search(before)
+    is_regex = not before or before[-1] in JS_REGEX_PRECEDERS or (
+        word is not None and word.group() in JS_REGEX_KEYWORDS)
+    end = _skip_regex(content, i) if is_regex else -1
+    return end if end != -1 else i + 1
+
+
+def _template_end(content: str, i: int, pieces: list, line_comments: bool) -> int:
+    """
+    Returns the index past the template literal opening at content[i],
+    appending it to pieces without the comments in its ${} substitutions.
+    """
+    n = len(content)
+    last = i
+    # Brace depth inside each open template literal ${...} substitution
+    templates = [-1]
+    i += 1
+    while templates and i < n:
+        if templates[-1] < 0:
+            # Inside template literal text
+            i = JS_TEMPLATE_TEXT.match(content, i).end()
+            if content.startswith("`", i):
+                templates.pop()
+                i += 1
+            elif content.startswith("${", i):
+                templates[-1] = 0
+                i += 2
+            else:
+                # Unterminated at the end of the file
+                i = n
+            continue
+
+        m = JS_TEMPLATE_SPECIAL.search(content, i)
+        if m is None:
+            i = n
+            break
+        i = m.start()
+        c = content[i]
+        if c in "'\"":
+            i = JS_STRING_BODY[c].match(content, i + 1).end()
+        elif c == "`":
+            templates.append(-1)
+            i += 1
+        elif c == "{":
+            templates[-1] += 1
+            i += 1
+        elif c == "}":
+            if templates[-1] == 0:
+                templates[-1] = -1
+            else:
+                templates[-1] -= 1
+            i += 1
+        elif content.startswith("/*", i):
+            end = content.find("*/", i + 2)
+            pieces.append(content[last:i])
+            last = i = n if end == -1 else end + 2
+        elif line_comments and content.startswith("//", i):
+            end = content.find("\n", i)
+            pieces.append(content[last:i])
+            last = i = n if end == -1 else end
+        elif line_comments:
+            i = _slash_end(content, i)
+        else:
+            i += 1
+    pieces.append(content[last:i])
+    return i
+
+
+def strip_c_comments(content: str, line_comments: bool = True) -> str:
+    """
+    Removes /* */ (and optionally //) comments with a single-pass lexer that
+    skips strings, template literals (including ${} nesting) and regex literals.
+    """
+    n = len(content)
+    code_piece = C_CODE_PIECE[line_comments]
+    pieces = []
+    i = 0
+    while i < n:
+        for m in code_piece.finditer(content, i):
+            pieces.append(m.group(1))
+            i = m.end()
+            if m.end(1) == i:
+                # No comment follows: the end of the file, or a token to settle here
+                break
+        if i == n:
+            break
+        if content[i] == "`":
+            i = _template_end(content, i, pieces, line_comments)
+        else:
+            # A slash whose meaning depends on more than the character before it
+            end = _slash_end(content, i)
+            pieces.append(content[i:end])
+            i = end
+    return "".join(pieces)
+
+
+def strip_hash_comments(content: str) -> str:
+    """Removes # comments that start a line or follow whitespace, outside quotes."""
+    n = len(content)
+    pieces = []
+    last = 0
+    i = content.find('#')
+    while i != -1:
+        start = content.rfind('\n', 0, i) + 1
+        end = content.find('\n', i)
+        end = n if end == -1 else end
+        if content.find("'", start, end) == -1 and content.find('"', start, end) == -1:
+            m = HASH_COMMENT.search(content, start, end)
+            cut = -1 if m is None else m.start()
+        else:
+            m = HASH_COMMENT_AFTER_QUOTES.match(content, start, end)
+            cut = -1 if m is None else m.end(1)
+        if cut != -1:
+            pieces.append(content[last:cut])
+            last = end
+        i = content.find('#', end)
+    pieces.append(content[last:])
+    return "".join(pieces)
+
+
+def strip_logging_calls(content: str) -> str:
+    """Removes logging.<func>(...) calls, matching parentheses outside quotes."""
+    if 'logging.' not in content:
+        return content
+    stripped = LOGGING_CALL_BALANCED.sub('', content)
+    if LOGGING_CALL.search(stripped) is None:
+        return stripped
+    # A call nested too deep for the pattern, or unbalanced
+    spans = []
+    pos = 0
+    while True:
+        m = LOGGING_CALL.search(content, pos)
+        if m is None:
+            break
+        depth = 0
+        i = m.end() - 1
+        while True:
+            token = LOGGING_ARGS_SPECIAL.search(content, i)
+            if token is None:
+                break
+            c = token.group()
+            i = token.end()
+            if c == "(":
+                depth += 1
+            elif c == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            else:
+                i = JS_MULTILINE_STRING_BODY[c].match(content, i).end()
+        if token is None:
+            # Unbalanced: every later call would also run to the end
+            break
+        spans.append((m.start(), i))
+        pos = i
+    return _cut(content, spans)
+
+
+def collapse_blank_lines(content: str) -> str:
+    return re.sub(r'\n\s*\n', '\n', content)
+
+
+def _timed(timings, name, func, *args, **kwargs):
+    """Calls func, adding its run time to timings[name] when timings is a dict."""
+    if timings is None:
+        return func(*args, **kwargs)
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+    return result
+
+
+def clean_source(content: str, file_path: str, shorten_funcs: bool = False, timings: Optional[dict] = None) -> str:
+    """
+    Removes comments and logging calls with the cleaner matching the file type.
+    With a timings dict, the seconds spent in each cleaner are added to it.
+    """
+    if file_path.endswith(".py"):
+        content = _timed(timings, "clean_python", clean_python, content)
+        content = _timed(timings, "collapse_blank_lines", collapse_blank_lines, content)
+        if shorten_funcs:
+            content = _timed(timings, "shorten_python", shorten_python, content)
+        return content
+    if file_path.endswith(JS_EXTENSIONS):
+        content = _timed(timings, "strip_c_comments", strip_c_comments, content)
+    elif file_path.endswith(BLOCK_COMMENT_EXTENSIONS):
+        content = _timed(timings, "strip_c_comments", strip_c_comments,
+                         content, line_comments=False)
+    elif not file_path.endswith(NO_COMMENT_EXTENSIONS):
+        content = _timed(timings, "strip_hash_comments", strip_hash_comments, content)
+    content = _timed(timings, "strip_logging_calls", strip_logging_calls, content)
+    return _timed(timings, "collapse_blank_lines", collapse_blank_lines, content)
@@ -0,0 +1,139 @@
+"""
+Thin client of _copy_daemon.py: sends one prompt build over the daemon's
+Unix socket and writes the returned prompt to --output.
+
+    python _copy_client.py [-b DIR] [-if PATTERN ...] [-m MESSAGE]
+        [-o clipboard] [--socket PATH] [--start]
+
+Takes the prompt options of _copy_for_prompt.py, but only the ones given
+are sent; the daemon fills in the rest from PromptConfig's defaults. It
+imports nothing beyond the standard library and _copy_sinks, so a build on a
+warm, unchanged tree costs little more than interpreter startup.
+
+The protocol is one JSON object per line each way, so an editor can also
+keep a connection open and talk to the socket directly:
+
+    {"op": "build", "options": {"base_dir": "...", "message": "..."}}
+    -> {"ok": true, "prompt": "...", "files": 12, "chars": 3456, "seconds": 0.004, ...}
+    {"op": "ping"} -> {"ok": true, "pid": 123, "workspaces": 1}
+    {"op": "shutdown"} -> {"ok": true}
+
+Failed requests are answered with {"ok": false, "error": "..."}.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp",
+                              f"copy_for_prompt-{os.getuid()}.sock")
+DEFAULT_START_TIMEOUT = 10.0
+DAEMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_copy_daemon.py")
+
+
+def request(message: dict, socket_path=DEFAULT_SOCKET, timeout=None) -> dict:
+    """Sends one request to the daemon and returns its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("the daemon closed the connection without replying")
+    return json.loads(line)
+
+
+def start_daemon(socket_path=DEFAULT_SOCKET, timeout=DEFAULT_START_TIMEOUT, extra_args=()):
+    """Starts _copy_daemon.py in the background and waits until it answers."""
+    import subprocess
+    subprocess.Popen([sys.executable, DAEMON, "--socket", socket_path, *extra_args],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return request({"op": "ping"}, socket_path, timeout)
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build a prompt through the _copy_daemon.py socket.')
+    option = argparse.SUPPRESS
+    parser.add_argument('-b', '--base-dir', default=option,
+                        help='Base directory to search files in (default: the daemon\'s)')
+    parser.add_argument('-if', '--include-files', nargs='*', default=option)
+    parser.add_argument('-ef', '--exclude-files', nargs='*', default=option)
+    parser.add_argument('-ic', '--include-content', nargs='*', default=option)
+    parser.add_argument('-ec', '--exclude-content', nargs='*', default=option)
+    parser.add_argument('-cs', '--case-sensitive', action='store_true', default=option)
+    parser.add_argument('-sf', '--shorten-funcs', action='store_true', default=option)
+    parser.add_argument('-s', '--system', default=option)
+    parser.add_argument('-m', '--message', default=option)
+    parser.add_argument('-i', '--instructions', default=option)
+    parser.add_argument('-fo', '--filenames-only', action='store_true', default=option)
+    parser.add_argument('-nl', '--no-length', action='store_true', default=option)
+    parser.add_argument('-tm', '--tree-max-files', type=int, default=option)
+    parser.add_argument('-mb', '--max-file-bytes', type=int, default=option)
+    parser.add_argument('-mt', '--max-tokens', type=int, default=option)
+    parser.add_argument('--no-dedupe', action='store_true', default=option)
+    parser.add_argument('-L', '--follow-symlinks', action='store_true', default=option)
+    parser.add_argument('--source', choices=['walk', 'git'], default=option)
+    parser.add_argument('-rt', '--relevant-to', nargs='?', const='', metavar='QUERY', default=option)
+    parser.add_argument('-k', '--top-k', type=int, default=option)
+    parser.add_argument('-o', '--output', default="clipboard",
+                        help='Where to write the prompt: clipboard, stdout, pbcopy, xclip, wl-copy or a file path (default: clipboard)')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help=f'Unix socket of the daemon (default: {DEFAULT_SOCKET})')
+    parser.add_argument('--start', action='store_true',
+                        help='Start the daemon in the background if it is not running')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Seconds to wait for the reply (default: no limit)')
+    parser.add_argument('--ping', action='store_true', help='Check that the daemon is running')
+    parser.add_argument('--shutdown', action='store_true', help='Stop the daemon')
+    args = vars(parser.parse_args())
+
+    output = args.pop("output")
+    socket_path = args.pop("socket")
+    start = args.pop("start")
+    timeout = args.pop("timeout")
+    if args.pop("ping"):
+        message = {"op": "ping"}
+    elif args.pop("shutdown"):
+        message = {"op": "shutdown"}
+    else:
+        if "base_dir" in args:
+            args["base_dir"] = os.path.abspath(args["base_dir"])
+        message = {"op": "build", "options": args}
+
+    try:
+        reply = request(message, socket_path, timeout)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not start or message["op"] == "shutdown":
+            raise SystemExit(f"No daemon listening on {socket_path} "
+                             "(start it with _copy_daemon.py or pass --start)")
+        start_daemon(socket_path)
+        reply = request(message, socket_path, timeout)
+    if not reply.get("ok"):
+        raise SystemExit(f"Daemon error: {reply.get('error')}")
+
+    if message["op"] != "build":
+        print(json.dumps(reply), file=sys.stderr)
+        return
+    from _copy_sinks import open_sink
+    with open_sink(output) as sink:
+        sink.write(reply["prompt"])
+    for path, error in reply["errors"]:
+        print(f"Error reading {path}: {error}", file=sys.stderr)
+    print(f"{reply['files']} files, {reply['chars']} chars, built in "
+          f"{reply['seconds'] * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import re
+import mmap
+import fnmatch
+from collections import deque
+from typing import Optional
+
+# Files are searched this many bytes at a time, so every literal's pass over
+# a chunk reads it from the CPU cache
+CHUNK_SIZE = 64 * 1024
+# From this many literals on, one automaton pass beats a bytes.find per literal
+# (see benchmarks/bench_content_filter.py)
+AUTOMATON_MIN_NEEDLES = 128
+
+
+class AhoCorasick:
+    """
+    Byte-level Aho-Corasick automaton compiled into a full transition table,
+    so scanning costs one table lookup per byte regardless of pattern count.
+    """
+
+    def __init__(self, patterns: list[tuple[bytes, int]]):
+        goto = [{}]
+        out = [0]
+        for pattern, pattern_id in patterns:
+            state = 0
+            for byte in pattern:
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][byte] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            out[state] |= 1 << pattern_id
+
+        # Breadth-first construction of failure links and the dense table
+        delta = [[0] * 256 for _ in goto]
+        for byte, nxt in goto[0].items():
+            delta[0][byte] = nxt
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            out[state] |= out[fail[state]]
+            row = delta[state]
+            row[:] = delta[fail[state]]
+            for byte, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]][byte]
+                row[byte] = nxt
+                queue.append(nxt)
+
+        self.delta = delta
+        self.out = out
+
+    def scan(self, data, state=0, stop_mask=0) -> tuple[int, int]:
+        """
+        Scans data from the given state and returns (matched_mask, state).
+        Returns early as soon as any pattern in stop_mask is found.
+        """
+        delta = self.delta
+        out = self.out
+        found = 0
+        for byte in data:
+            state = delta[state][byte]
+            hit = out[state]
+            if hit:
+                found |= hit
+                if found & stop_mask:
+                    break
+        return found, state
+
+
+def _literal(pattern: str):
+    """Returns the literal inside a pattern that only means "contains", else None."""
+    core = pattern.strip('*')
+    if core and not any(c in core for c in "*?[") and (
+            core == pattern or (pattern.startswith('*') and pattern.endswith('*'))):
+        return core
+    return None
+
+
+def _variants(text: str, case_sensitive: bool) -> set[bytes]:
+    if case_sensitive or text.isascii():
+        return {text.encode('utf-8')}
+    # bytes.lower only folds ASCII; cover common non-ASCII spellings explicitly
+    return {v.encode('utf-8') for v in (text, text.lower(), text.upper(), text.title())}
+
+
+def _needles(literals: list[str], case_sensitive: bool) -> list[bytes]:
+    """Byte strings to search for, lowercased unless case_sensitive, longest first."""
+    needles = {variant if case_sensitive else variant.lower()
+               for literal in literals for variant in _variants(literal, case_sensitive)}
+    return sorted(needles, key=lambda needle: (-len(needle), needle))
+
+
+def _automaton(needles: list[bytes]) -> Optional[AhoCorasick]:
+    """An automaton for needles when there are enough of them for it to be faster."""
+    if len(needles) < AUTOMATON_MIN_NEEDLES:
+        return None
+    return AhoCorasick([(needle, 0) for needle in needles])
+
+
+class ContentFilter:
+    """
+    Include/exclude content patterns compiled once and applied to files
+    streamed through mmap.
+
+    Literal patterns (and "*literal*") are searched with bytes.find, one
+    CHUNK_SIZE chunk of the mapped file at a time, lowered first unless
+    case_sensitive. Only one chunk is ever copied, every search runs in C over
+    data already in the CPU cache, and scanning stops at the first match.
+    With AUTOMATON_MIN_NEEDLES or more literals on one side, their chunks go
+    through one Aho-Corasick automaton instead, whose cost does not grow with
+    the number of literals. Exclude patterns are only searched once an
+    include pattern matched. Other wildcard patterns keep fnmatch semantics
+    and are matched as a regex against the whole mapped file.
+    """
+
+    def __init__(self, include_patterns, exclude_patterns, case_sensitive=False):
+        self.case_sensitive = case_sensitive
+        self.enabled = bool(include_patterns or exclude_patterns)
+        self.has_include = bool(include_patterns)
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        literals = ([], [])
+        self.include_regexes = []
+        self.exclude_regexes = []
+        for is_exclude, patterns in ((False, include_patterns), (True, exclude_patterns)):
+            for pattern in patterns or []:
+                literal = _literal(pattern)
+                if literal is None:
+                    regex = re.compile(fnmatch.translate(
+                        pattern).encode('utf-8'), flags)
+                    (self.exclude_regexes if is_exclude else self.include_regexes).append(regex)
+                else:
+                    literals[is_exclude].append(literal)
+
+        self.include_literals = _needles(literals[False], case_sensitive)
+        self.exclude_literals = _needles(literals[True], case_sensitive)
+        # Chunks overlap by this much so matches across a boundary are found
+        self.overlap = max(map(len, self.include_literals + self.exclude_literals), default=1) - 1
+        self.include_automaton = _automaton(self.include_literals)
+        self.exclude_automaton = _automaton(self.exclude_literals)
+
+    def matches(self, file_path) -> bool:
+        """Check if the file content matches the include patterns and none of the exclude patterns."""
+        if not self.enabled:
+            return True
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return self.matches_data(b"")
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return self.matches_data(mm)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {file_path}: {e}")
+            return False
+
+    def _contains(self, data, needles: list[bytes], automaton: Optional[AhoCorasick]) -> bool:
+        if not needles:
+            return False
+        if automaton is not None:
+            # The automaton carries its state across chunks, so they need no overlap
+            state = 0
+            for start in range(0, len(data), CHUNK_SIZE):
+                chunk = data[start:start + CHUNK_SIZE]
+                found, state = automaton.scan(
+                    chunk if self.case_sensitive else chunk.lower(), state, stop_mask=1)
+                if found:
+                    return True
+            return False
+        for start in range(0, len(data), CHUNK_SIZE):
+            chunk = data[max(0, start - self.overlap):start + CHUNK_SIZE]
+            if not self.case_sensitive:
+                chunk = chunk.lower()
+            if any(chunk.find(needle) != -1 for needle in needles):
+                return True
+        return False
+
+    def matches_data(self, data) -> bool:
+        if self.has_include and not (
+                self._contains(data, self.include_literals, self.include_automaton)
+                or any(regex.match(data) for regex in self.include_regexes)):
+            return False
+        return not (self._contains(data, self.exclude_literals, self.exclude_automaton)
+                    or any(regex.match(data) for regex in self.exclude_regexes))
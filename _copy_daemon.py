@@ -0,0 +1,296 @@
+"""
+Long-lived prompt builder that keeps scan indexes warm and serves
+_copy_for_prompt builds over a Unix domain socket.
+
+    python _copy_daemon.py [--socket PATH] [--cache-dir .cache] [--no-cache]
+        [--jobs 1] [--max-workspaces 8]
+
+Requests come from _copy_client.py (which documents the protocol) or any
+program writing JSON lines to the socket. Each distinct set of file
+patterns and cleaning options gets a workspace: its matched files and their
+cleaned contents stay in memory, and a watcher (inotify, else mtime polling)
+collects what changed in between. A build first drains the watcher, so a
+file saved just before the request is always seen, then re-stats or re-walks
+only as far as the changes require. On an unchanged tree a build only
+renders the prompt from memory.
+
+Connections are served on threads; builds of one workspace run one at a
+time, builds of different workspaces concurrently.
+"""
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+from collections import OrderedDict
+from dataclasses import fields, replace
+from typing import Optional
+from _copy_for_prompt import PromptConfig, build_prompt, collect_files, rank_files, file_dir
+from _copy_file_structure import ScanIndex
+from _copy_cache import ContentCache
+from _copy_sinks import MemorySink
+from _copy_stats import RunStats
+from _copy_watch import Changes, create_watcher, watch_dirs
+from _copy_client import DEFAULT_SOCKET
+
+DEFAULT_MAX_WORKSPACES = 8
+# Daemon-wide settings, and modes that need state the daemon does not keep per request
+DAEMON_FIELDS = {"cache_dir", "jobs"}
+UNSUPPORTED_FIELDS = {"since", "since_last_run", "chunk_size", "chunk_unit"}
+REQUEST_FIELDS = {f.name for f in fields(PromptConfig)} - DAEMON_FIELDS - UNSUPPORTED_FIELDS
+
+
+class Workspace:
+    """Matched files of one set of patterns and options, loaded and kept current."""
+
+    def __init__(self, config: PromptConfig, cache_dir=None, jobs=1):
+        self.config = config
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.lock = threading.Lock()
+        self.index = ScanIndex(config.base_dir, config.shorten_funcs,
+                               max_file_bytes=config.max_file_bytes)
+        self.watcher = None
+        self.ignore = [os.path.abspath(cache_dir)] if cache_dir else []
+
+    def _watch_dirs(self):
+        return watch_dirs(self.config.base_dir, self.config.exclude_files,
+                          self.config.case_sensitive)
+
+    def refresh(self, stats: RunStats):
+        """Applies every change the watcher saw since the last build, then loads what changed."""
+        config = self.config
+        if self.watcher is None:
+            # Watch before the first walk so nothing changes unseen in between
+            self.watcher = create_watcher(self._watch_dirs(), self.ignore)
+            structural = True
+        else:
+            with stats.phase("changes"):
+                changes = Changes()
+                while True:
+                    more = self.watcher.wait(0)
+                    if not more:
+                        break
+                    changes.update(more)
+            # Edits can change which files the content patterns match
+            structural = changes.structural or bool(
+                changes and (config.include_content or config.exclude_content))
+            if changes.structural:
+                self.watcher.watch(self._watch_dirs())
+            elif changes:
+                stats.count("files_changed", len(self.index.refresh(changes.paths)))
+        if structural:
+            with stats.phase("find_files"):
+                files = list(collect_files(config, stats))
+            changed, removed = self.index.sync(files)
+            stats.count("files_changed", len(changed))
+            stats.count("files_removed", len(removed))
+
+        self.index.stats = stats
+        cache = ContentCache(self.cache_dir) if self.cache_dir else None
+        self.index.cache = cache
+        try:
+            with stats.phase("load"):
+                self.index.load_all(self.jobs)
+            if cache is not None:
+                cache.commit()
+        finally:
+            # SQLite connections stay with the thread that opened them
+            self.index.cache = None
+            if cache is not None:
+                cache.close()
+
+    def build(self, config: PromptConfig) -> dict:
+        """Refreshes the workspace and returns the reply to a build request for config."""
+        start = time.perf_counter()
+        stats = RunStats()
+        with self.lock:
+            self.refresh(stats)
+            view = self.index
+            if config.relevant_to is not None:
+                selected, _ = rank_files(config, [record.path for record in self.index], stats)
+                view = ScanIndex(config.base_dir, config.shorten_funcs, stats=stats,
+                                 max_file_bytes=config.max_file_bytes)
+                view.records = {path: self.index.records[path] for path in selected}
+            # Marks left by an earlier build with other options or files
+            for record in self.index:
+                record.duplicate_of = None
+            sink = MemorySink()
+            result = build_prompt(config, sink, view, release=False)
+            prompt = sink.getvalue()
+        return {
+            "ok": True,
+            "prompt": prompt,
+            "files": len(view),
+            "chars": result.chars,
+            "duplicates": [record.path for record in result.duplicates],
+            "dropped": [record.path for record in result.dropped],
+            "errors": [[record.path, record.error] for record in view.errors],
+            "seconds": time.perf_counter() - start,
+            "counters": stats.counters,
+        }
+
+    def close(self):
+        with self.lock:
+            if self.watcher is not None:
+                self.watcher.close()
+                self.watcher = None
+
+
+class PromptDaemon:
+    """Workspaces by scan options, least recently used evicted past max_workspaces."""
+
+    def __init__(self, cache_dir=None, jobs=1, max_workspaces=DEFAULT_MAX_WORKSPACES):
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.max_workspaces = max_workspaces
+        self.lock = threading.Lock()
+        self.workspaces: OrderedDict[tuple, Workspace] = OrderedDict()
+
+    def config_for(self, options: dict) -> PromptConfig:
+        if not isinstance(options, dict):
+            raise ValueError("options must be an object")
+        unsupported = set(options) & UNSUPPORTED_FIELDS
+        if unsupported:
+            raise ValueError(f"not supported by the daemon: {sorted(unsupported)}")
+        unknown = set(options) - REQUEST_FIELDS - DAEMON_FIELDS
+        if unknown:
+            raise ValueError(f"unknown options {sorted(unknown)}")
+        options = {name: value for name, value in options.items() if name in REQUEST_FIELDS}
+        config = replace(PromptConfig(), cache_dir=self.cache_dir, jobs=self.jobs, **options)
+        config.base_dir = os.path.abspath(config.base_dir)
+        if not os.path.isdir(config.base_dir):
+            raise ValueError(f"not a directory: {config.base_dir}")
+        return config
+
+    def workspace(self, config: PromptConfig) -> Workspace:
+        key = (config.base_dir, tuple(config.include_files), tuple(config.exclude_files),
+               tuple(config.include_content), tuple(config.exclude_content),
+               config.case_sensitive, config.source, config.follow_symlinks,
+               config.shorten_funcs, config.max_file_bytes)
+        evicted = []
+        with self.lock:
+            workspace = self.workspaces.get(key)
+            if workspace is None:
+                workspace = self.workspaces[key] = Workspace(config, self.cache_dir, self.jobs)
+                while len(self.workspaces) > self.max_workspaces:
+                    evicted.append(self.workspaces.popitem(last=False)[1])
+            self.workspaces.move_to_end(key)
+        for old in evicted:
+            old.close()
+        return workspace
+
+    def handle(self, message) -> dict:
+        if not isinstance(message, dict):
+            raise ValueError("expected a JSON object")
+        op = message.get("op", "build")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "workspaces": len(self.workspaces)}
+        if op == "build":
+            config = self.config_for(message.get("options", {}))
+            reply = self.workspace(config).build(config)
+            print(f"Built {config.base_dir}: {reply['files']} files, {reply['chars']} chars "
+                  f"in {reply['seconds'] * 1000:.1f} ms")
+            return reply
+        raise ValueError(f"unknown op {op!r}")
+
+    def close(self):
+        with self.lock:
+            workspaces = list(self.workspaces.values())
+            self.workspaces.clear()
+        for workspace in workspaces:
+            workspace.close()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Answers each JSON line of a connection with one JSON line."""
+
+    def handle(self):
+        daemon: PromptDaemon = self.server.daemon
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                if isinstance(message, dict) and message.get("op") == "shutdown":
+                    self.reply({"ok": True})
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                reply = daemon.handle(message)
+            except (ValueError, OSError) as e:
+                reply = {"ok": False, "error": str(e)}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.reply(reply)
+
+    def reply(self, reply: dict):
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon: PromptDaemon):
+        self.daemon = daemon
+        super().__init__(socket_path, RequestHandler)
+
+
+def claim_socket(socket_path):
+    """Removes a stale socket file; exits if another daemon is listening on it."""
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    raise SystemExit(f"A daemon is already listening on {socket_path}")
+
+
+def serve(socket_path=DEFAULT_SOCKET, cache_dir: Optional[str] = None, jobs=1, max_workspaces=DEFAULT_MAX_WORKSPACES):
+    claim_socket(socket_path)
+    daemon = PromptDaemon(cache_dir, jobs, max_workspaces)
+    # The socket answers with file contents: only its owner may connect
+    old_umask = os.umask(0o177)
+    try:
+        server = DaemonServer(socket_path, daemon)
+    finally:
+        os.umask(old_umask)
+    print(f"Serving prompt builds on {socket_path} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Serve _copy_for_prompt builds from warm indexes over a Unix socket.')
+    parser.add_argument('-S', '--socket', default=DEFAULT_SOCKET,
+                        help=f'Unix socket to listen on (default: {DEFAULT_SOCKET})')
+    parser.add_argument('--cache-dir', default=os.path.join(file_dir, ".cache"),
+                        help='Directory of the cleaned content cache (default: .cache)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the cleaned content cache')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of parallel workers for reading and cleaning files (default: 1)')
+    parser.add_argument('--max-workspaces', type=int, default=DEFAULT_MAX_WORKSPACES,
+                        help='Sets of patterns kept warm before the least recently used is dropped (default: 8)')
+    args = parser.parse_args()
+    serve(args.socket, None if args.no_cache else args.cache_dir, args.jobs, args.max_workspaces)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
 import os
-import fnmatch
-import argparse
-import subprocess
 import re
-from jet.logger import logger
+import stat
+import time
+from dataclasses import dataclass
+from typing import Optional
+from _copy_matcher import GlobMatcher, join_rel
+from _copy_walk import walk
+from _copy_cache import ContentCache
+from _copy_sinks import open_sink
+from _copy_tokens import estimate_tokens
+from _copy_stats import RunStats
+from _copy_read import DEFAULT_MAX_FILE_BYTES, BinaryFileError, is_excerpted, read_source
+from _copy_cleaners import (
+    clean_source,
+    collapse_blank_lines,
+    shorten_python,
+    strip_hash_comments,
+    strip_logging_calls,
+)
+
+# Bump whenever clean_content output changes so cached content is invalidated
+CLEANER_VERSION = 2
+# Files listed per directory in the file structure before the rest are summarized
+DEFAULT_TREE_MAX_FILES = 100
 
 exclude_files = [
     ".git",
@@ -12,6 +31,7 @@ exclude_files = [
     "_copy*.py",
     "__pycache__",
     ".vscode",
+    ".cache",
     "node_modules",
     "*lock.json",
     "public",
@@ -35,47 +55,40 @@ exclude_content = []
 
 # base_dir should be actual file directory
 file_dir = os.path.dirname(os.path.abspath(__file__))
-# Change the current working directory to the script's directory
-os.chdir(file_dir)
+
+
+def log(*args, **kwargs):
+    """jet.logger's logger.log, imported on first use to keep imports fast."""
+    from jet.logger import logger
+    logger.log(*args, **kwargs)
 
 
 def find_files(base_dir, include, exclude, include_content_patterns, exclude_content_patterns, case_sensitive=False):
     print("Base Dir:", file_dir)
     print("Finding files:", base_dir, include, exclude)
     include_abs = [
-        os.path.abspath(pat) if not os.path.isabs(pat) else pat
+        os.path.normpath(os.path.join(file_dir, pat))
         for pat in include
-        if os.path.exists(os.path.abspath(pat) if not os.path.isabs(pat) else pat)
+        if os.path.exists(os.path.join(file_dir, pat))
     ]
 
+    matcher = GlobMatcher(include, exclude, case_sensitive)
     matched_files = set(include_abs)
-    for root, dirs, files in os.walk(base_dir):
-        adjusted_include = [
-            os.path.relpath(os.path.join(base_dir, pat), base_dir) if not any(
-                c in pat for c in "*?") else pat
-            for pat in include
-        ]
-        adjusted_exclude = [
-            os.path.relpath(os.path.join(base_dir, pat), base_dir) if not any(
-                c in pat for c in "*?") else pat
-            for pat in exclude
-        ]
-
-        if not case_sensitive:
-            adjusted_include = [pat.lower() for pat in adjusted_include]
-            adjusted_exclude = [pat.lower() for pat in adjusted_exclude]
-
-        dirs[:] = [d for d in dirs if not any(
-            fnmatch.fnmatch(d.lower() if not case_sensitive else d, pat)
-            for pat in adjusted_exclude
-        )]
+    included_dirs = set()
+    for rel_root, dirs, files in walk(base_dir):
+        in_included_dir = rel_root in included_dirs
+
+        dirs[:] = [d for d in dirs
+                   if not matcher.excludes(join_rel(rel_root, d), d)]
+        for d in dirs:
+            dir_path = join_rel(rel_root, d)
+            if in_included_dir or matcher.includes_dir(dir_path, d):
+                included_dirs.add(dir_path)
 
         for file in files:
-            file_path = os.path.relpath(os.path.join(root, file), base_dir)
-            normalized_file_path = file_path.lower() if not case_sensitive else file_path
+            file_path = join_rel(rel_root, file)
 
-            if any(fnmatch.fnmatch(normalized_file_path, pat) for pat in adjusted_include) and \
-               not any(fnmatch.fnmatch(normalized_file_path, pat) for pat in adjusted_exclude):
+            if (in_included_dir or matcher.includes_file(file_path)) and not matcher.excludes(file_path, file):
                 if file_path not in matched_files:
                     matched_files.add(file_path)
 
@@ -88,19 +101,13 @@ def clean_newlines(content):
 
 
 def clean_comments(content):
-    """Removes comments from the given content."""
-    return re.sub(r'#.*', '', content)
+    """Removes # comments from the given content, leaving strings and URLs intact."""
+    return strip_hash_comments(content)
 
 
 def clean_logging(content):
     """Removes logging statements from the given content, including multi-line ones."""
-    logging_pattern = re.compile(
-        r'logging\.(?:info|debug|error|warning|critical|exception|log|basicConfig|getLogger|disable|shutdown)\s*\((?:[^)(]+|\((?:[^)(]+|\([^)(]*\))*\))*\)',
-        re.DOTALL
-    )
-    content = re.sub(logging_pattern, '', content)
-    content = re.sub(r'\n\s*\n', '\n', content)
-    return content
+    return collapse_blank_lines(strip_logging_calls(content))
 
 
 def clean_print(content):
@@ -108,121 +115,442 @@ def clean_print(content):
     return re.sub(r'print\(.+?\)(,?.*?\))?', '', content, flags=re.DOTALL)
 
 
-def clean_content(content: str, file_path: str, shorten_funcs: bool = True):
+def clean_content(content: str, file_path: str, shorten_funcs: bool = True, timings: Optional[dict] = None):
     """Clean the content based on file type and apply various cleaning operations."""
-    if not file_path.endswith(".md"):
-        content = clean_comments(content)
-    content = clean_logging(content)
+    content = clean_source(content, file_path, shorten_funcs, timings)
     # content = clean_print(content)
-    if shorten_funcs and file_path.endswith(".py"):
-        content = shorten_functions(content)
     return content
 
 
-def remove_parent_paths(path: str) -> str:
-    return os.path.join(
-        *(part for part in os.path.normpath(path).split(os.sep) if part != ".."))
-
+def timed_read_source(file_path, max_bytes=None) -> tuple[str, bool, float]:
+    """Returns (*read_source(file_path, max_bytes), seconds), so pool workers report their own time."""
+    start = time.perf_counter()
+    return (*read_source(file_path, max_bytes), time.perf_counter() - start)
 
-def shorten_functions(content):
-    """Keeps only function and class definitions, including those with return type annotations."""
-    pattern = re.compile(
-        r'^\s*(class\s+\w+\s*:|(?:async\s+)?def\s+\w+\s*\((?:[^)(]*|\([^)(]*\))*\)\s*(?:->\s*[\w\[\],\s]+)?\s*:)', re.MULTILINE
-    )
-    matches = pattern.findall(content)
-    cleaned_content = "\n".join(matches)
-    cleaned_content = re.sub(r'\n+', '\n', cleaned_content)
-    return cleaned_content.strip()
-
-
-def get_file_length(file_path, shorten_funcs):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            content = clean_content(content, file_path, shorten_funcs)
-        return len(content)
-    except (OSError, IOError):
-        return 0
-
-
-def format_file_structure(base_dir, include_files, exclude_files, include_content, exclude_content, case_sensitive=True, shorten_funcs=True, show_file_length=True):
-    files: list[str] = find_files(base_dir, include_files, exclude_files,
-                                  include_content, exclude_content, case_sensitive)
-    # Create a new set for absolute file paths
-    absolute_file_paths = set()
-
-    # Iterate in reverse to avoid index shifting while popping
-    for file in files:
-        if not file.startswith("/"):
-            file = os.path.join(file_dir, file)
-        absolute_file_paths.add(os.path.relpath(file))
 
-    files = list(absolute_file_paths)
+def timed_clean_content(content: str, file_path: str, shorten_funcs: bool) -> tuple[str, dict, float]:
+    """Returns (cleaned content, per-cleaner seconds, total seconds)."""
+    timings = {}
+    start = time.perf_counter()
+    content = clean_content(content, file_path, shorten_funcs, timings)
+    return content, timings, time.perf_counter() - start
 
-    dir_structure = {}
-    total_char_length = 0
 
-    for file in files:
-        # Convert to relative path
-        file = os.path.relpath(file)
+def content_digest(content: str) -> str:
+    """BLAKE2b digest of cleaned content, used to find files with identical content."""
+    import hashlib
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
 
-        dirs = file.split(os.sep)
-        current_level = dir_structure
 
-        if file.startswith("/"):
-            dirs.pop(0)
-        if ".." in dirs:
-            dirs = [dir for dir in dirs if dir != ".."]
-
-        for dir_name in dirs[:-1]:
-            if dir_name not in current_level:
-                current_level[dir_name] = {}
-            current_level = current_level[dir_name]
+def remove_parent_paths(path: str) -> str:
+    return os.path.join(
+        *(part for part in os.path.normpath(path).split(os.sep) if part != ".."))
 
-        file_path = os.path.join(base_dir, file)
-        file_length = get_file_length(file_path, shorten_funcs)
-        total_char_length += file_length
 
-        if show_file_length:
-            current_level[f"{dirs[-1]} ({file_length})"] = None
-        else:
-            current_level[dirs[-1]] = None
-
-    def print_structure(level, indent="", is_base_level=False):
-        result = ""
-        sorted_keys = sorted(level.items(), key=lambda x: (
-            x[1] is not None, x[0].lower()))
-
-        if is_base_level:
-            for key, value in sorted_keys:
-                if value is None:
-                    result += key + "\n"
-                else:
-                    result += key + "/\n"
-                    result += print_structure(value, indent + "    ", False)
+def shorten_functions(content):
+    """Keeps only function and class definitions, including those with return type annotations."""
+    return shorten_python(content)
+
+
+@dataclass
+class FileRecord:
+    """A matched file, stat'ed, read and cleaned at most once per run."""
+    path: str
+    abs_path: str
+    size: int = 0
+    mtime_ns: int = 0
+    raw: Optional[str] = None
+    content: Optional[str] = None
+    length: int = 0
+    tokens: int = 0
+    loaded: bool = False
+    error: Optional[str] = None
+    # Skipped without reading past the first bytes
+    binary: bool = False
+    # Larger than max_file_bytes: content is a head/tail excerpt
+    excerpted: bool = False
+    # Unchanged in a --since run: shown in the file structure by name only, never read
+    listed_only: bool = False
+    digest: Optional[str] = None
+    # Path of an earlier record with identical content, set by mark_duplicates
+    duplicate_of: Optional[str] = None
+    # Measured and cached but not kept in memory: ScanIndex.content_of reads it back
+    deferred: bool = False
+
+    @property
+    def has_content(self) -> bool:
+        """Whether the record has cleaned content, held or deferred."""
+        return self.content is not None or self.deferred
+
+
+class ScanIndex:
+    """In-memory index of matched files shared by content assembly and the file structure."""
+
+    def __init__(self, base_dir, shorten_funcs=False, keep_raw=False, cache: Optional[ContentCache] = None, stats: Optional[RunStats] = None, max_file_bytes=DEFAULT_MAX_FILE_BYTES, defer_content=False):
+        self.base_dir = base_dir
+        self.shorten_funcs = shorten_funcs
+        self.max_file_bytes = max_file_bytes
+        self.keep_raw = keep_raw
+        self.cache = cache
+        # With a cache, loaded content is dropped once measured and read back when written
+        self.defer_content = defer_content
+        self.stats = stats if stats is not None else RunStats()
+        self.records: dict[str, FileRecord] = {}
+        # Paths removed since the --since baseline, for the prompt to mention
+        self.removed: list[str] = []
+
+    @property
+    def cache_options(self) -> str:
+        return f"{CLEANER_VERSION}:{int(self.shorten_funcs)}:{self.max_file_bytes or 0}"
+
+    def add(self, file) -> Optional[FileRecord]:
+        """Stats a file (relative to base_dir or absolute) and adds it to the index."""
+        abs_path = os.path.abspath(os.path.join(self.base_dir, file))
+        rel_path = os.path.relpath(abs_path, self.base_dir)
+        if rel_path in self.records:
+            return self.records[rel_path]
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        record = FileRecord(path=rel_path, abs_path=abs_path,
+                            size=st.st_size, mtime_ns=st.st_mtime_ns)
+        self.records[rel_path] = record
+        return record
+
+    def sync(self, files) -> tuple[list[FileRecord], list[str]]:
+        """
+        Replaces the indexed files with the given find_files results. Records
+        whose size and mtime are unchanged keep their loaded content.
+        Returns (added or changed records, removed paths).
+        """
+        previous = self.records
+        self.records = {}
+        changed = []
+        for file in files:
+            record = self.add(file)
+            if record is None:
+                continue
+            old = previous.get(record.path)
+            if old is not None and (old.mtime_ns, old.size) == (record.mtime_ns, record.size):
+                self.records[record.path] = old
+            else:
+                changed.append(record)
+        removed = [path for path in previous if path not in self.records]
+        return changed, removed
+
+    def refresh(self, abs_paths) -> list[FileRecord]:
+        """Re-stats indexed files by absolute path; returns records that changed."""
+        by_abs_path = {record.abs_path: record for record in self.records.values()}
+        changed = []
+        for abs_path in abs_paths:
+            old = by_abs_path.get(abs_path)
+            if old is None:
+                continue
+            del self.records[old.path]
+            record = self.add(abs_path)
+            if record is None:
+                continue
+            if (old.mtime_ns, old.size) == (record.mtime_ns, record.size):
+                self.records[record.path] = old
+            else:
+                changed.append(record)
+        return changed
+
+    def load(self, record: FileRecord) -> FileRecord:
+        """Reads and cleans a record's content unless it was already loaded."""
+        if record.loaded or record.listed_only:
+            return record
+        record.loaded = True
+        if not self._load_cached(record):
+            self._read_and_clean(record)
+        return record
+
+    def _read_and_clean(self, record: FileRecord):
+        record.loaded = True
+        try:
+            raw, excerpted, read_seconds = timed_read_source(
+                record.abs_path, self.max_file_bytes)
+        except BinaryFileError:
+            self._set_binary(record)
+            return
+        except (OSError, UnicodeDecodeError) as e:
+            record.error = str(e)
+            return
+        record.excerpted = excerpted
+        self._set_content(record, raw, read_seconds, *timed_clean_content(
+            raw, record.path, self.shorten_funcs))
+
+    def load_all(self, jobs=1):
+        """
+        Loads every record. With jobs > 1, files are read on a thread pool and
+        cleaned on a process pool; results are applied in path order.
+        """
+        pending = [record for record in self
+                   if not record.loaded and not record.listed_only
+                   and not self._load_cached(record)]
+        if jobs <= 1 or len(pending) < 2:
+            for record in pending:
+                self._read_and_clean(record)
+            return self
+
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        with ThreadPoolExecutor(max_workers=jobs) as readers, \
+                ProcessPoolExecutor(max_workers=jobs) as cleaners:
+            reads = [readers.submit(timed_read_source, record.abs_path, self.max_file_bytes)
+                     for record in pending]
+            cleans = []
+            for record, read in zip(pending, reads):
+                record.loaded = True
+                try:
+                    raw, record.excerpted, read_seconds = read.result()
+                except BinaryFileError:
+                    self._set_binary(record)
+                    cleans.append(None)
+                    continue
+                except (OSError, UnicodeDecodeError) as e:
+                    record.error = str(e)
+                    cleans.append(None)
+                    continue
+                cleans.append((raw, read_seconds, cleaners.submit(
+                    timed_clean_content, raw, record.path, self.shorten_funcs)))
+
+            for record, clean in zip(pending, cleans):
+                if clean is None:
+                    continue
+                raw, read_seconds, future = clean
+                try:
+                    self._set_content(record, raw, read_seconds, *future.result())
+                except Exception as e:
+                    record.error = f"{type(e).__name__}: {e}"
+        return self
+
+    def _load_cached(self, record: FileRecord) -> bool:
+        if self.cache is None or self.keep_raw:
+            return False
+        hit = self.cache.get(record.abs_path, record.mtime_ns,
+                             record.size, self.cache_options)
+        if hit is None:
+            return False
+        record.content, record.length, record.tokens, record.digest = hit
+        record.excerpted = is_excerpted(record.size, self.max_file_bytes)
+        record.loaded = True
+        self.stats.count("files_cached")
+        self._defer(record)
+        return True
+
+    def _set_binary(self, record: FileRecord):
+        record.binary = True
+        self.stats.count("binary_skipped")
+
+    def _set_content(self, record: FileRecord, raw: str, read_seconds: float, content: str, timings: dict, clean_seconds: float):
+        self.stats.count("files_read")
+        if record.excerpted:
+            self.stats.count("files_excerpted")
         else:
-            for key, value in sorted_keys:
-                if value is None:
-                    result += indent + "├── " + key + "\n"
-                else:
-                    result += indent + "├── " + key + "/\n"
-                    result += print_structure(value, indent + "│   ", False)
-
-        return result
-
-    file_structure = print_structure(dir_structure, is_base_level=True)
+            self.stats.count("bytes_read", record.size)
+        self.stats.add_time("read", read_seconds)
+        self.stats.add_time("clean_content", clean_seconds)
+        self.stats.add_cleaner_times(timings)
+        self.stats.add_file(record.path, read_seconds + clean_seconds)
+        record.content = content
+        record.length = len(content)
+        record.tokens = estimate_tokens(content)
+        record.digest = content_digest(content)
+        if self.keep_raw:
+            record.raw = raw
+        if self.cache is not None:
+            self.cache.put(record.abs_path, record.mtime_ns, record.size,
+                           self.cache_options, content, record.tokens, record.digest)
+            self._defer(record)
+
+    def _defer(self, record: FileRecord):
+        if self.defer_content and self.cache is not None:
+            record.content = None
+            record.deferred = True
+
+    def content_of(self, record: FileRecord) -> Optional[str]:
+        """
+        Returns a record's cleaned content. Deferred content is read back from
+        the cache, or read and cleaned again if its entry is gone or the file
+        changed since it was loaded.
+        """
+        if not record.deferred:
+            return record.content
+        if self.cache is not None:
+            content = self.cache.get_content(record.abs_path, record.mtime_ns,
+                                             record.size, self.cache_options)
+            if content is not None:
+                return content
+        try:
+            raw, _, _ = timed_read_source(record.abs_path, self.max_file_bytes)
+        except (BinaryFileError, OSError, UnicodeDecodeError) as e:
+            record.error = str(e) or type(e).__name__
+            return None
+        content, _, _ = timed_clean_content(raw, record.path, self.shorten_funcs)
+        return content
+
+    def mark_duplicates(self) -> list[FileRecord]:
+        """
+        Points each record whose content repeats an earlier record's (in path
+        order) at that record through duplicate_of. Returns the duplicates.
+        """
+        originals = {}
+        duplicates = []
+        for record in self:
+            record.duplicate_of = None
+            if not record.has_content or record.digest is None:
+                continue
+            original = originals.setdefault(record.digest, record.path)
+            if original != record.path:
+                record.duplicate_of = original
+                duplicates.append(record)
+        return duplicates
+
+    @property
+    def errors(self) -> list[FileRecord]:
+        return [record for record in self if record.error]
+
+    @property
+    def binaries(self) -> list[FileRecord]:
+        return [record for record in self if record.binary]
+
+    @property
+    def excerpts(self) -> list[FileRecord]:
+        return [record for record in self if record.excerpted]
+
+    def __iter__(self):
+        return iter(sorted(self.records.values(), key=lambda r: r.path))
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def total_length(self) -> int:
+        return sum(record.length for record in self.records.values())
+
+
+def build_index(base_dir, files, shorten_funcs=False, load=True, jobs=1, cache: Optional[ContentCache] = None, stats: Optional[RunStats] = None, max_file_bytes=DEFAULT_MAX_FILE_BYTES) -> ScanIndex:
+    """Builds a ScanIndex from find_files results in a single pass."""
+    index = ScanIndex(base_dir, shorten_funcs, cache=cache, stats=stats,
+                      max_file_bytes=max_file_bytes)
+    for file in files:
+        index.add(file)
+    if load:
+        with index.stats.phase("load"):
+            index.load_all(jobs)
+    return index
+
+
+class TreeNode:
+    """A directory of the rendered file structure, with the char total of everything below it."""
+    __slots__ = ("dirs", "files", "total")
+
+    def __init__(self):
+        self.dirs: dict[str, "TreeNode"] = {}
+        self.files: list[tuple[str, int]] = []
+        self.total = 0
+
+
+def build_tree(paths_and_lengths) -> TreeNode:
+    """Builds the directory tree from (path parts, length) pairs and sums totals bottom-up."""
+    root = TreeNode()
+    for parts, length in paths_and_lengths:
+        node = root
+        for dir_name in parts[:-1]:
+            child = node.dirs.get(dir_name)
+            if child is None:
+                child = node.dirs[dir_name] = TreeNode()
+            node = child
+        node.files.append((parts[-1], length))
+
+    # Parents precede their children in pre-order, so reversing it visits
+    # every child before its parent: one pass computes all totals
+    order = [root]
+    for node in order:
+        order.extend(node.dirs.values())
+    for node in reversed(order):
+        node.total = sum(length or 0 for _, length in node.files) + \
+            sum(child.total for child in node.dirs.values())
+    return root
+
+
+def render_tree(root: TreeNode, show_file_length=True, max_files=DEFAULT_TREE_MAX_FILES) -> str:
+    """
+    Renders the tree iteratively into a list of lines. Chains of directories
+    holding a single directory are collapsed into one "a/b/c/" line, and
+    past max_files (0 or None for no limit) the rest of a directory's files
+    are summarized in one line. Files with a None length are listed by name.
+    """
+    def label(name, length):
+        return f"{name} ({length})" if show_file_length and length is not None else name
+
+    lines = []
+    # Items are either finished lines or (node, indent, is_base_level)
+    stack = [(root, "", True)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            lines.append(item)
+            continue
+        node, indent, is_base_level = item
+        prefix = "" if is_base_level else indent + "├── "
+        child_indent = indent + ("    " if is_base_level else "│   ")
+
+        entries = []
+        files = sorted(node.files, key=lambda file: file[0].lower())
+        shown = files[:max_files] if max_files else files
+        entries.extend(prefix + label(name, length) for name, length in shown)
+        if len(shown) < len(files):
+            hidden = files[len(shown):]
+            summary = f"… {len(hidden)} more files"
+            if show_file_length:
+                summary += f" ({sum(length or 0 for _, length in hidden)} chars)"
+            entries.append(prefix + summary)
+
+        for name in sorted(node.dirs, key=str.lower):
+            child = node.dirs[name]
+            while len(child.dirs) == 1 and not child.files:
+                (sub_name, child), = child.dirs.items()
+                name = f"{name}/{sub_name}"
+            entries.append(prefix + label(f"{name}/", child.total))
+            entries.append((child, child_indent, False))
+        stack.extend(reversed(entries))
+    return "\n".join(lines)
+
+
+def format_file_structure(base_dir, include_files, exclude_files, include_content, exclude_content, case_sensitive=True, shorten_funcs=True, show_file_length=True, index: Optional[ScanIndex] = None, verbose=True, max_files=DEFAULT_TREE_MAX_FILES, max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+    if index is None:
+        files: list[str] = find_files(base_dir, include_files, exclude_files,
+                                      include_content, exclude_content, case_sensitive)
+        index = build_index(base_dir, files, shorten_funcs,
+                            max_file_bytes=max_file_bytes)
+
+    def paths_and_lengths():
+        for record in index:
+            index.load(record)
+            # Convert to a path relative to the script directory
+            parts = os.path.relpath(record.abs_path, file_dir).split(os.sep)
+            yield [part for part in parts if part != ".."], \
+                None if record.listed_only else record.length
+
+    root = build_tree(paths_and_lengths())
+    file_structure = render_tree(root, show_file_length, max_files)
     # file_structure = f"Base dir: {file_dir}\n" + \
     #     f"\nFile structure:\n{file_structure}"
-    print("\n")
-    num_files = len(files)
-    logger.log("Number of Files:", num_files, colors=["GRAY", "DEBUG"])
-    logger.log("Files Char Count:", total_char_length,
-               colors=["GRAY", "SUCCESS"])
+    if verbose:
+        print("\n")
+        log("Number of Files:", len(index), colors=["GRAY", "DEBUG"])
+        log("Files Char Count:", root.total,
+            colors=["GRAY", "SUCCESS"])
     return file_structure.strip()
 
 
 def main():
     global exclude_files, include_files, include_content, exclude_content
+    import argparse
 
     print("Running _copy_for_prompt.py")
     parser = argparse.ArgumentParser(
@@ -243,6 +571,12 @@ def main():
                         help='Only copy the relative filenames, not their contents')
     parser.add_argument('-nl', '--no-length', action='store_true',
                         help='Do not show file character length')
+    parser.add_argument('-tm', '--tree-max-files', type=int, default=DEFAULT_TREE_MAX_FILES,
+                        help='Files listed per directory before the rest are summarized (0 for no limit, default: 100)')
+    parser.add_argument('-mb', '--max-file-bytes', type=int, default=DEFAULT_MAX_FILE_BYTES,
+                        help='Files larger than this are counted from a head/tail excerpt (0 for no limit, default: 1048576)')
+    parser.add_argument('-o', '--output', default="clipboard",
+                        help='Where to write the structure: clipboard, stdout, pbcopy, xclip, wl-copy or a file path')
 
     args = parser.parse_args()
     base_dir = args.base_dir
@@ -253,20 +587,21 @@ def main():
     case_sensitive = args.case_sensitive
     filenames_only = args.filenames_only
     show_file_length = not args.no_length
+    output = args.output
 
     print("\nGenerating file structure...")
     file_structure = format_file_structure(
         base_dir, include, exclude, include_content, exclude_content,
-        case_sensitive, shorten_funcs=False, show_file_length=show_file_length)
+        case_sensitive, shorten_funcs=False, show_file_length=show_file_length,
+        max_files=args.tree_max_files, max_file_bytes=args.max_file_bytes)
 
     print(
         f"\n----- START FILES STRUCTURE -----\n{file_structure}\n----- END FILES STRUCTURE -----\n")
 
-    process = subprocess.Popen(
-        'pbcopy', env={'LANG': 'en_US.UTF-8'}, stdin=subprocess.PIPE)
-    process.communicate(file_structure.encode('utf-8'))
+    with open_sink(output) as sink:
+        sink.write(file_structure)
 
-    print(f"\nFile structure copied to clipboard.")
+    print(f"\nFile structure copied to {output}.")
 
 
 if __name__ == "__main__":
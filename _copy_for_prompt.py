@@ -1,14 +1,25 @@
 import os
-import fnmatch
-import argparse
-import subprocess
+from dataclasses import dataclass, field, fields
+from typing import Iterator, Optional
 from _copy_file_structure import (
+    DEFAULT_TREE_MAX_FILES,
+    FileRecord,
+    ScanIndex,
     format_file_structure,
-    clean_newlines,
-    clean_content,
-    remove_parent_paths
+    remove_parent_paths,
+    build_index,
+    log,
 )
-from jet.logger import logger
+from _copy_matcher import GlobMatcher, join_rel
+from _copy_cache import ContentCache
+from _copy_content_filter import ContentFilter
+from _copy_sinks import PART_SEPARATOR, NewlineCleaner, open_sink
+from _copy_tokens import duplicate_marker, estimate_tokens, file_header, fit_to_budget
+from _copy_stats import DEFAULT_SLOWEST_FILES, RunStats, profile
+from _copy_walk import walk
+from _copy_read import DEFAULT_MAX_FILE_BYTES
+from _copy_search import DEFAULT_TOP_K
+from _copy_chunks import DEFAULT_CHUNK_UNIT
 
 exclude_files = [
     ".git",
@@ -17,6 +28,7 @@ exclude_files = [
     "_copy*.py",
     "__pycache__",
     ".pytest_cache",
+    ".cache",
     "node_modules",
     "*lock.json",
     "public",
@@ -44,6 +56,13 @@ exclude_content = []
 DEFAULT_SHORTEN_FUNCTS = False
 DEFAULT_NO_CHAR_LENGTH = False
 INCLUDE_FILE_STRUCTURE = False
+DEFAULT_JOBS = 1
+DEFAULT_USE_CACHE = True
+DEFAULT_OUTPUT = "clipboard"
+DEFAULT_MAX_TOKENS = None
+DEFAULT_STATS = None
+DEFAULT_SOURCE = "walk"
+DEFAULT_DEDUPE = True
 
 DEFAULT_SYSTEM_MESSAGE = """
 Dont use or add to memory.
@@ -79,120 +98,439 @@ DEFAULT_INSTRUCTIONS_MESSAGE = """
 
 # base_dir should be actual file directory
 file_dir = os.path.dirname(os.path.abspath(__file__))
-# Change the current working directory to the script's directory
-os.chdir(file_dir)
 
 
-def find_files(base_dir, include, exclude, include_content_patterns, exclude_content_patterns, case_sensitive=False):
-    print("Base Dir:", file_dir)
-    print("Finding files:", base_dir, include, exclude)
-    include_abs = [
-        os.path.relpath(path=pat, start=file_dir)
-        if not os.path.isabs(pat) else pat
-        for pat in include
-        if os.path.exists(os.path.abspath(pat) if not os.path.isabs(pat) else pat)
-    ]
-
-    matched_files = set(include_abs)
-    for root, dirs, files in os.walk(base_dir):
-        # Adjust include and exclude lists: if no wildcard, treat it as a specific file in the current directory
-        adjusted_include = [
-            os.path.relpath(os.path.join(base_dir, pat), base_dir) if not any(
-                c in pat for c in "*?") else pat
-            for pat in include
-        ]
-        adjusted_exclude = [
-            os.path.relpath(os.path.join(base_dir, pat), base_dir) if not any(
-                c in pat for c in "*?") else pat
-            for pat in exclude
-        ]
+@dataclass
+class PromptConfig:
+    """
+    Options of one prompt build, for use as a library. Field names match the
+    command-line options; cache_dir=None disables the content cache.
+    """
+    base_dir: str = file_dir
+    include_files: list[str] = field(default_factory=lambda: list(include_files))
+    exclude_files: list[str] = field(default_factory=lambda: list(exclude_files))
+    include_content: list[str] = field(default_factory=list)
+    exclude_content: list[str] = field(default_factory=list)
+    case_sensitive: bool = False
+    shorten_funcs: bool = DEFAULT_SHORTEN_FUNCTS
+    system: str = DEFAULT_SYSTEM_MESSAGE
+    message: str = DEFAULT_QUERY_MESSAGE
+    instructions: str = DEFAULT_INSTRUCTIONS_MESSAGE
+    filenames_only: bool = False
+    no_length: bool = DEFAULT_NO_CHAR_LENGTH
+    tree_max_files: int = DEFAULT_TREE_MAX_FILES
+    max_file_bytes: int = DEFAULT_MAX_FILE_BYTES
+    jobs: int = DEFAULT_JOBS
+    max_tokens: Optional[int] = DEFAULT_MAX_TOKENS
+    no_dedupe: bool = not DEFAULT_DEDUPE
+    source: str = DEFAULT_SOURCE
+    follow_symlinks: bool = False
+    cache_dir: Optional[str] = None
+    # Keep only the top_k files most relevant to this query ("": the message, None: keep all)
+    relevant_to: Optional[str] = None
+    top_k: int = DEFAULT_TOP_K
+    # Read only files changed since this git ref, or since the last run (needs cache_dir)
+    since: Optional[str] = None
+    since_last_run: bool = False
+    # Split the prompt into chunks of at most this many chunk_unit ("chars" or "tokens")
+    chunk_size: Optional[int] = None
+    chunk_unit: str = DEFAULT_CHUNK_UNIT
+
+    @classmethod
+    def from_args(cls, args) -> "PromptConfig":
+        values = {f.name: getattr(args, f.name) for f in fields(cls)}
+        if args.no_cache:
+            values["cache_dir"] = None
+        return cls(**values)
+
+
+@dataclass
+class PromptResult:
+    """What build_prompt wrote, for callers that report on it."""
+    index: ScanIndex
+    files_structure: str
+    chars: int
+    duplicates: list[FileRecord] = field(default_factory=list)
+    kept: list[FileRecord] = field(default_factory=list)
+    shortened: list[FileRecord] = field(default_factory=list)
+    dropped: list[FileRecord] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    chunks: list[list[FileRecord]] = field(default_factory=list)
+    oversized: list[FileRecord] = field(default_factory=list)
+
+
+def iter_files(base_dir, include, exclude, include_content_patterns, exclude_content_patterns, case_sensitive=False, stats=None, source=DEFAULT_SOURCE, follow_symlinks=False) -> Iterator[str]:
+    """
+    Yields files under base_dir matching the include/exclude globs and content
+    patterns, without printing. With source="git", candidates are the files git
+    tracks or does not ignore instead of everything on disk, so ignored trees
+    are never read. Each directory is visited once, in a single top-down pass.
+    """
+    if stats is None:
+        stats = RunStats()
+    matched_files = set()
+    for pat in include:
+        if os.path.exists(os.path.join(file_dir, pat)):
+            file_path = pat if os.path.isabs(pat) else os.path.normpath(pat)
+            if file_path not in matched_files:
+                matched_files.add(file_path)
+                yield file_path
+
+    matcher = GlobMatcher(include, exclude, case_sensitive)
+    content_filter = ContentFilter(
+        include_content_patterns, exclude_content_patterns, case_sensitive)
+    # Directories matching an include pattern, and everything below them
+    included_dirs = set()
+    if source == "git":
+        from _copy_git import GitTree
+        tree = GitTree(base_dir).walk()
+    else:
+        tree = walk(base_dir, follow_symlinks)
+    for rel_root, dirs, files in tree:
+        root = os.path.join(base_dir, rel_root)
+        in_included_dir = rel_root in included_dirs
+        stats.count("dirs_visited")
+        stats.count("files_visited", len(files))
 
         # Exclude specified directories with or without wildcard support
-        dirs[:] = [d for d in dirs if not any(
-            fnmatch.fnmatch(d, pat) or fnmatch.fnmatch(os.path.join(root, d), pat) for pat in adjusted_exclude)]
-
-        # Check for files in the current directory that match the include patterns without wildcard support
-        for file in files:
-            file_path = os.path.relpath(os.path.join(root, file), base_dir)
-            if file_path in adjusted_include and not any(fnmatch.fnmatch(file_path, pat) for pat in adjusted_exclude):
-                if file_path not in matched_files:
-                    matched_files.add(file_path)  # Add to the set
-                    print(f"Matched file in current directory: {file_path}")
-
-        # Check for directories that match the include patterns
+        dir_count = len(dirs)
+        dirs[:] = [d for d in dirs
+                   if not matcher.excludes(join_rel(rel_root, d), d)]
+        stats.count("dirs_pruned", dir_count - len(dirs))
         for dir_name in dirs:
-            dir_path = os.path.relpath(os.path.join(root, dir_name), base_dir)
-            if any(fnmatch.fnmatch(dir_name, pat) for pat in adjusted_include) or any(fnmatch.fnmatch(dir_path, pat) for pat in adjusted_include):
-                # If the directory matches, find all files within this directory
-                for sub_root, _, sub_files in os.walk(os.path.join(root, dir_name)):
-                    # Check if sub_root is excluded
-                    base_sub_root = os.path.basename(sub_root)
-                    if any(fnmatch.fnmatch(base_sub_root, pat) for pat in adjusted_exclude):
-                        break
-                    for file in sub_files:
-                        file_path = os.path.relpath(
-                            os.path.join(sub_root, file), base_dir)
-                        if not any(fnmatch.fnmatch(file_path, pat) for pat in adjusted_exclude):
-                            if file_path not in matched_files:
-                                matched_files.add(file_path)  # Add to the set
-                                print(
-                                    f"Matched file in directory: {file_path}")
-
-        # Check for files that match the include patterns
+            dir_path = join_rel(rel_root, dir_name)
+            if in_included_dir or matcher.includes_dir(dir_path, dir_name):
+                included_dirs.add(dir_path)
+
         for file in files:
-            file_path = os.path.relpath(os.path.join(root, file), base_dir)
-            is_current_package_json = (
-                file_path == "package.json" and "./package.json" in adjusted_include and root == base_dir)
-            if (is_current_package_json or any(fnmatch.fnmatch(file_path, pat) for pat in adjusted_include)) and not any(fnmatch.fnmatch(file_path, pat) for pat in adjusted_exclude):
-                # Check if file is excluded
-                if file in adjusted_exclude:
+            file_path = join_rel(rel_root, file)
+            if file_path in matched_files or matcher.excludes(file_path, file):
+                continue
+            # Explicitly listed files and everything below an included
+            # directory skip the content filters
+            if not (matcher.is_explicit(file_path) or in_included_dir):
+                if not matcher.includes_file(file_path):
                     continue
                 # Check file contents against include_content and exclude_content patterns
-                full_path = os.path.join(root, file)
-                if matches_content(full_path, include_content_patterns, exclude_content_patterns, case_sensitive):
-                    if file_path not in matched_files:
-                        matched_files.add(file_path)  # Add to the set
-                        print(f"Matched file: {file_path}")
+                with stats.phase("matches_content"):
+                    content_matched = content_filter.matches(
+                        os.path.join(root, file))
+                stats.count("content_checked")
+                if not content_matched:
+                    stats.count("content_rejected")
+                    continue
+            matched_files.add(file_path)
+            yield file_path
+
+    stats.count("files_matched", len(matched_files))
+
+
+def find_files(base_dir, include, exclude, include_content_patterns, exclude_content_patterns, case_sensitive=False, stats=None, source=DEFAULT_SOURCE, follow_symlinks=False):
+    """Returns the iter_files matches as a list, printing each one."""
+    print("Base Dir:", file_dir)
+    print("Finding files:", base_dir, include, exclude)
+    matched_files = []
+    for file_path in iter_files(base_dir, include, exclude, include_content_patterns, exclude_content_patterns,
+                                case_sensitive, stats, source, follow_symlinks):
+        print(f"Matched file: {file_path}")
+        matched_files.append(file_path)
+    return matched_files
+
+
+def collect_files(config: PromptConfig, stats: Optional[RunStats] = None) -> Iterator[str]:
+    """Yields the paths, relative to config.base_dir, of the files a prompt for config includes."""
+    return iter_files(config.base_dir, config.include_files, config.exclude_files,
+                      config.include_content, config.exclude_content, config.case_sensitive,
+                      stats, config.source, config.follow_symlinks)
 
-    # Convert the set back to a list before returning
-    return list(matched_files)
+
+def rank_files(config: PromptConfig, files, stats: Optional[RunStats] = None) -> tuple[list[str], list[tuple[str, float]]]:
+    """
+    Narrows files to the config.top_k best BM25 matches for config.relevant_to
+    (or config.message when it is empty), best first, after any explicitly
+    listed files. The inverted index is kept next to the content cache and
+    only re-tokenizes files that changed.
+    Returns (selected files, ranked (file, score) pairs).
+    """
+    from _copy_search import SearchIndex
+
+    if stats is None:
+        stats = RunStats()
+    with stats.phase("relevance"), SearchIndex(config.cache_dir) as search:
+        stats.count("search_indexed", search.update(
+            config.base_dir, files, config.max_file_bytes))
+        ranked = search.search(config.relevant_to or config.message,
+                               config.base_dir, files, config.top_k)
+    explicit_matcher = GlobMatcher(config.include_files, [], config.case_sensitive)
+    selected = [file for file in files if explicit_matcher.is_explicit(file)]
+    selected += [file for file, _ in ranked if file not in selected]
+    return selected, ranked
 
 
 def matches_content(file_path, include_patterns, exclude_patterns, case_sensitive=False):
     """
     Check if the file content matches include_patterns and does not match exclude_patterns.
     """
-    if not include_patterns and not exclude_patterns:
-        return True
+    return ContentFilter(include_patterns, exclude_patterns, case_sensitive).matches(file_path)
+
+
+def prompt_header(system_message, instructions_message, query_message, files_structure, part=None) -> str:
+    """Returns every prompt section that precedes the file contents; part is (number, total) of a chunk."""
+    # Prepend system and query to the clipboard content then append instructions
+    parts = []
+    if system_message:
+        parts.append(f"SYSTEM\n{system_message}")
+    if instructions_message:
+        parts.append(f"INSTRUCTIONS\n{instructions_message}")
+    parts.append(f"QUERY\n{query_message}")
+    if INCLUDE_FILE_STRUCTURE:
+        parts.append(f"FILES STRUCTURE\n{files_structure}")
+    parts.append(f"FILES CONTENTS (part {part[0]} of {part[1]})\n" if part else "FILES CONTENTS\n")
+    return "\n\n".join(parts)
+
+
+def written_path(record: FileRecord) -> str:
+    """The path a record is labelled with in the prompt."""
+    return remove_parent_paths(os.path.relpath(path=record.abs_path, start=file_dir))
+
+
+def write_prompt(sink, index, system_message, instructions_message, query_message, files_structure, filenames_only=False, release=True, records=None, part=None, written=None):
+    """
+    Writes the prompt sections into the sink. File contents are written one
+    file at a time through NewlineCleaner and, with release, freed once written;
+    deferred contents are read back from the index's cache just before.
+    Records marked as duplicates of an already written file get a marker instead,
+    and files removed since the --since baseline a "(removed)" line.
+
+    For one chunk of a chunked prompt, records are the chunk's files, part is
+    (number, total) and written maps the records of every chunk to their
+    labels, so duplicates can point at a file in another chunk.
+    """
+    sink.write(prompt_header(system_message, instructions_message,
+                             query_message, files_structure, part))
+
+    contents = NewlineCleaner(sink)
+    written = {} if written is None else written
+    for record in index if records is None else records:
+        if record.listed_only:
+            continue
+        if filenames_only:
+            contents.write(f"{record.path}\n")
+            continue
+        if not record.has_content:
+            continue
+        if record.duplicate_of in written:
+            body = duplicate_marker(written[record.duplicate_of])
+        else:
+            body = index.content_of(record)
+            if body is None:
+                continue
+        cleaned_rel_path = written_path(record)
+        written[record.path] = cleaned_rel_path
+        contents.write(file_header(cleaned_rel_path))
+        contents.write(body)
+        contents.write("\n\n")
+        if release:
+            record.content = None
+            record.deferred = False
+    for path in index.removed if part is None or part[0] == part[1] else []:
+        if filenames_only:
+            contents.write(f"{path} (removed)\n")
+            continue
+        rel_path = os.path.relpath(os.path.join(index.base_dir, path), start=file_dir)
+        contents.write(f"\n// {remove_parent_paths(rel_path)}\n(removed)\n\n")
+    contents.close()
+
+
+def index_changes(config: PromptConfig, files, cache: Optional[ContentCache] = None, stats: Optional[RunStats] = None, defer_content=False) -> ScanIndex:
+    """
+    Builds and loads the index of files for config. With config.since or
+    config.since_last_run, only files changed since then are read and cleaned;
+    the rest stay listed by name in the file structure, and removed files are
+    kept in index.removed. With defer_content and a cache, only the length,
+    tokens and digest of each file stay in memory.
+    """
+    index = build_index(config.base_dir, files, config.shorten_funcs, load=False,
+                        jobs=config.jobs, cache=cache, stats=stats,
+                        max_file_bytes=config.max_file_bytes)
+    index.defer_content = defer_content
+    stats = index.stats
+    if config.since is not None or config.since_last_run:
+        from _copy_changes import (changes_since_last_run, changes_since_ref,
+                                   limit_to, load_run_manifest, run_manifest_path)
+        with stats.phase("changes"):
+            matcher = GlobMatcher(config.include_files, config.exclude_files,
+                                  config.case_sensitive)
+            if config.since is not None:
+                changed, index.removed = changes_since_ref(index, config.since, matcher)
+            else:
+                if not config.cache_dir:
+                    raise ValueError("since_last_run needs a cache_dir")
+                manifest = load_run_manifest(run_manifest_path(config.cache_dir, config.base_dir))
+                changed, index.removed = changes_since_last_run(index, manifest, matcher, config.jobs)
+            limit_to(index, changed)
+        stats.count("files_unchanged", sum(record.listed_only for record in index))
+        stats.count("files_removed", len(index.removed))
+    with stats.phase("load"):
+        index.load_all(config.jobs)
+    return index
+
+
+def save_run(config: PromptConfig, index: ScanIndex):
+    """Records the indexed files as the baseline of the next since_last_run build."""
+    from _copy_changes import load_run_manifest, run_manifest_path, save_run_manifest
+
+    path = run_manifest_path(config.cache_dir, config.base_dir)
+    matcher = GlobMatcher(config.include_files, config.exclude_files, config.case_sensitive)
+    try:
+        save_run_manifest(path, index, load_run_manifest(path), matcher)
+    except OSError as e:
+        print(f"Could not save the last-run manifest {path}: {e}")
+
+
+def build_prompt(config: PromptConfig, sink, index: Optional[ScanIndex] = None, release=True, stats: Optional[RunStats] = None) -> PromptResult:
+    """
+    Writes the prompt for config into sink without printing anything.
+
+    Files are collected and loaded unless an index (e.g. one kept up to date
+    by --watch) is given; a build that loads its own files with a cache_dir
+    becomes the baseline of the next since_last_run build. With release=False,
+    every record keeps (or will reload) its full content so the prompt can be
+    built again.
+    """
+    save = False
+    cache = None
+    if index is None:
+        stats = stats if stats is not None else RunStats()
+        with stats.phase("find_files"):
+            files = list(collect_files(config, stats))
+        if config.relevant_to is not None:
+            files, _ = rank_files(config, files, stats)
+        cache = ContentCache(config.cache_dir) if config.cache_dir else None
+        try:
+            index = index_changes(config, files, cache, stats, defer_content=release)
+        except BaseException:
+            if cache is not None:
+                cache.close()
+            raise
+        if cache is not None:
+            # Deferred content is read back from the committed entries while writing
+            cache.commit()
+        save = bool(config.cache_dir)
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-            if not case_sensitive:
-                # Convert content to lowercase for case-insensitive matching
-                content = content.lower()
-
-            # Check for include content patterns
-            if include_patterns:
-                include_patterns = [
-                    pattern if case_sensitive else pattern.lower() for pattern in include_patterns]
-                if not any((fnmatch.fnmatch(content, pattern) if '*' in pattern or '?' in pattern else pattern in content) for pattern in include_patterns):
-                    return False
-
-            # Check for exclude content patterns
-            if exclude_patterns:
-                exclude_patterns = [
-                    pattern if case_sensitive else pattern.lower() for pattern in exclude_patterns]
-                if any((fnmatch.fnmatch(content, pattern) if '*' in pattern or '?' in pattern else pattern in content) for pattern in exclude_patterns):
-                    return False
-
-        return True
-    except (OSError, IOError) as e:
-        print(f"Error reading {file_path}: {e}")
-        return False
+        return _write_built_prompt(config, sink, index, release, save)
+    finally:
+        if cache is not None:
+            cache.close()
+            index.cache = None
+
+
+def _write_built_prompt(config: PromptConfig, sink, index: ScanIndex, release, save) -> PromptResult:
+    """Dedupes, fits and writes the loaded index; the body of build_prompt."""
+    stats = index.stats
+
+    # Generate and format the file structure
+    with stats.phase("format_file_structure"):
+        files_structure = format_file_structure(
+            config.base_dir,
+            include_files=structure_include + config.include_files,
+            exclude_files=structure_exclude + config.exclude_files,
+            include_content=config.include_content,
+            exclude_content=config.exclude_content,
+            case_sensitive=config.case_sensitive,
+            shorten_funcs=config.shorten_funcs,
+            show_file_length=not config.no_length,
+            index=index,
+            verbose=False,
+            max_files=config.tree_max_files,
+        )
+    result = PromptResult(index, files_structure, 0, removed=list(index.removed))
+
+    if not config.no_dedupe:
+        result.duplicates = index.mark_duplicates()
+        stats.count("duplicates", len(result.duplicates))
+
+    if config.max_tokens and not config.filenames_only:
+        with stats.phase("fit_to_budget"):
+            header_tokens = estimate_tokens(prompt_header(
+                config.system, config.instructions, config.message, files_structure))
+            explicit_matcher = GlobMatcher(
+                config.include_files, [], config.case_sensitive)
+            explicit = {record.path for record in index
+                        if explicit_matcher.is_explicit(record.path)}
+            result.kept, result.shortened, result.dropped = fit_to_budget(
+                index, config.max_tokens - header_tokens, explicit,
+                content_of=index.content_of, path_of=written_path)
+
+    # Stream the prompt into the sink section by section
+    chars = sink.chars
+    if config.chunk_size:
+        result.chunks, result.oversized = write_chunks(
+            sink, index, config, files_structure, release)
+    else:
+        with stats.phase("output"):
+            write_prompt(sink, index, config.system, config.instructions,
+                         config.message, files_structure, config.filenames_only, release)
+    result.chars = sink.chars - chars
+    stats.count("prompt_chars", result.chars)
+    if save:
+        save_run(config, index)
+
+    if not release:
+        # Reload full content of trimmed files on the next load_all
+        for record in result.shortened + result.dropped:
+            record.content = None
+            record.loaded = False
+    return result
+
+
+def write_chunks(sink, index, config: PromptConfig, files_structure, release=True) -> tuple[list[list[FileRecord]], list[FileRecord]]:
+    """
+    Packs the loaded files into chunks of at most config.chunk_size
+    (config.chunk_unit) including the repeated header, then writes the chunks
+    one after another through sink.start_part, releasing each chunk's content
+    as it goes. Returns the chunks and the files too large for any chunk,
+    which get a chunk of their own.
+    """
+    from _copy_chunks import pack_chunks
+
+    measure = len if config.chunk_unit == "chars" else estimate_tokens
+    records = [record for record in index
+               if record.has_content and not record.listed_only]
+    # Sized for a three-digit part count, so the header never outgrows its share
+    header = prompt_header(config.system, config.instructions, config.message,
+                           files_structure, (999, 999))
+    capacity = config.chunk_size - measure(header) - measure(PART_SEPARATOR)
+    if capacity <= 0:
+        raise ValueError(f"chunk size {config.chunk_size} does not fit the "
+                         f"{measure(header)} {config.chunk_unit} prompt header")
+
+    written = {record.path: written_path(record) for record in records
+               if not record.duplicate_of}
+
+    def cost(record):
+        header = file_header(written_path(record))
+        if record.duplicate_of in written:
+            return measure(header + duplicate_marker(written[record.duplicate_of]))
+        return measure(header) + (record.length if config.chunk_unit == "chars" else record.tokens)
+
+    stats = index.stats
+    with stats.phase("pack_chunks"):
+        costs = {record.path: cost(record) for record in records}
+        chunks = pack_chunks(records, capacity, lambda record: costs[record.path])
+    stats.count("chunks", len(chunks))
+    with stats.phase("output"):
+        for number, chunk in enumerate(chunks or [[]], 1):
+            sink.start_part(number, len(chunks) or 1)
+            write_prompt(sink, index, config.system, config.instructions,
+                         config.message, files_structure, release=release,
+                         records=chunk, part=(number, len(chunks) or 1), written=written)
+    return chunks, [record for record in records if costs[record.path] > capacity]
 
 
 def main():
-    global exclude_files, include_files, include_content, exclude_content
+    import argparse
+    from _copy_watch import DEFAULT_DEBOUNCE
 
     print("Running _copy_for_prompt.py")
     # Parse command-line options
@@ -222,111 +560,248 @@ def main():
                         help='Only copy the relative filenames, not their contents')
     parser.add_argument('-nl', '--no-length', action='store_true', default=DEFAULT_NO_CHAR_LENGTH,
                         help='Do not show file character length')
+    parser.add_argument('-tm', '--tree-max-files', type=int, default=DEFAULT_TREE_MAX_FILES,
+                        help='Files listed per directory in the file structure before the rest are summarized (0 for no limit, default: 100)')
+    parser.add_argument('-mb', '--max-file-bytes', type=int, default=DEFAULT_MAX_FILE_BYTES,
+                        help='Files larger than this contribute only a head/tail excerpt (0 for no limit, default: 1048576)')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help='Number of parallel workers for reading and cleaning files (default: 1)')
+    parser.add_argument('--no-cache', action='store_true', default=not DEFAULT_USE_CACHE,
+                        help='Do not read or write the cleaned content cache')
+    parser.add_argument('-mt', '--max-tokens', type=int, default=DEFAULT_MAX_TOKENS,
+                        help='Fit the prompt into this many estimated tokens, shortening or dropping files')
+    parser.add_argument('-cz', '--chunk-size', type=int,
+                        help='Split the prompt into the fewest chunks of at most this many --chunk-unit, each with the full header')
+    parser.add_argument('--chunk-unit', choices=['chars', 'tokens'], default=DEFAULT_CHUNK_UNIT,
+                        help='Unit of --chunk-size: characters or estimated tokens (default: tokens)')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='Where to write the prompt: clipboard, stdout, pbcopy, xclip, wl-copy or a file path (default: clipboard)')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='Keep running and re-emit the prompt whenever matched files change')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='Seconds of quiet before a watch rebuild (default: 0.3)')
+    parser.add_argument('--cache-dir', default=os.path.join(file_dir, ".cache"),
+                        help='Directory of the cleaned content cache (default: .cache)')
+    parser.add_argument('--stats', nargs='?', const='text', default=DEFAULT_STATS, choices=['text', 'json'],
+                        help='Report per-phase times, counters, cleaner times and the slowest files (default format: text)')
+    parser.add_argument('--stats-file',
+                        help='Write the --stats report to this file instead of printing it')
+    parser.add_argument('--slowest', type=int, default=DEFAULT_SLOWEST_FILES,
+                        help='Number of slowest files listed by --stats (default: 10)')
+    parser.add_argument('--no-dedupe', action='store_true', default=not DEFAULT_DEDUPE,
+                        help='Write files with identical cleaned content in full instead of as "identical to <path>"')
+    parser.add_argument('-L', '--follow-symlinks', action='store_true',
+                        help='Descend into symlinked directories (each directory is still visited once)')
+    parser.add_argument('--source', choices=['walk', 'git'], default=DEFAULT_SOURCE,
+                        help='List candidate files by walking the disk or from git (tracked and untracked, not ignored) (default: walk)')
+    parser.add_argument('--profile',
+                        help='Run under cProfile and dump pstats data to this file')
+    parser.add_argument('-rt', '--relevant-to', nargs='?', const='', metavar='QUERY',
+                        help='Keep only the files most relevant to QUERY (default: the --message text), ranked by BM25')
+    parser.add_argument('-k', '--top-k', type=int, default=DEFAULT_TOP_K,
+                        help='Files kept by --relevant-to (0 for every matching file, default: 20)')
+    parser.add_argument('--since', metavar='REF',
+                        help='Include only the contents of files changed, added or removed since this git ref; the rest are listed by name')
+    parser.add_argument('--since-last-run', action='store_true',
+                        help='Include only the contents of files whose cleaned content changed since the last run')
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help='Build every job of a JSON manifest in one run, reading shared files once (see _copy_batch.py)')
 
     args = parser.parse_args()
-    base_dir = args.base_dir
-    include = args.include_files
-    exclude = args.exclude_files
-    include_content = args.include_content
-    exclude_content = args.exclude_content
-    case_sensitive = args.case_sensitive
-    shorten_funcs = args.shorten_funcs
-    query_message = args.message
-    system_message = args.system
-    instructions_message = args.instructions
-    filenames_only = args.filenames_only
-    show_file_length = not args.no_length
+    if args.batch and args.watch:
+        parser.error("--batch cannot be combined with --watch")
+    if args.since is not None and args.since_last_run:
+        parser.error("--since cannot be combined with --since-last-run")
+    if (args.since is not None or args.since_last_run) and (args.watch or args.batch):
+        parser.error("--since and --since-last-run cannot be combined with --watch or --batch")
+    if args.chunk_size is not None and (args.max_tokens or args.filenames_only):
+        parser.error("--chunk-size cannot be combined with --max-tokens or --filenames-only")
+    if args.chunk_size is not None and args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    if args.since_last_run and args.no_cache:
+        parser.error("--since-last-run needs the cache (drop --no-cache)")
+    with profile(args.profile):
+        run(args)
+
+
+def run(args):
+    if args.batch:
+        run_batch_manifest(args)
+        return
+    config = PromptConfig.from_args(args)
+    cache = ContentCache(config.cache_dir) if config.cache_dir else None
 
     # Find all files matching the patterns in the base directory and its subdirectories
     print("\n")
-    context_files = find_files(base_dir, include, exclude,
-                               include_content, exclude_content, case_sensitive)
+    stats = RunStats(args.slowest)
+    try:
+        with stats.phase("find_files"):
+            context_files = find_files_for(config, stats)
+    except FileNotFoundError as e:
+        raise SystemExit(f"Cannot list files from {config.source}: {e}")
 
     print("\n")
-    print(f"Include patterns: {include}")
-    print(f"Exclude patterns: {exclude}")
-    print(f"Include content patterns: {include_content}")
-    print(f"Exclude content patterns: {exclude_content}")
-    print(f"Case sensitive: {case_sensitive}")
-    print(f"Filenames only: {filenames_only}")
+    print(f"Include patterns: {config.include_files}")
+    print(f"Exclude patterns: {config.exclude_files}")
+    print(f"Include content patterns: {config.include_content}")
+    print(f"Exclude content patterns: {config.exclude_content}")
+    print(f"Case sensitive: {config.case_sensitive}")
+    print(f"Filenames only: {config.filenames_only}")
     print(f"\nFound files ({len(context_files)}): {context_files}")
 
     if not context_files:
         print("No context files found matching the given patterns.")
+        report_stats(stats, args)
         return
     print("\n")
 
-    # Initialize the clipboard content
-    clipboard_content = ""
-
-    # Append relative filenames to the clipboard content
-    for file in context_files:
-        rel_path = os.path.relpath(path=file, start=file_dir)
-        cleaned_rel_path = remove_parent_paths(rel_path)
-
-        prefix = (
-            f"\n// {cleaned_rel_path}\n" if not filenames_only else f"{file}\n")
-        if filenames_only:
-            clipboard_content += f"{prefix}"
-        else:
-            file_path = os.path.relpath(os.path.join(base_dir, file))
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        content = clean_content(content, file, shorten_funcs)
-                        clipboard_content += f"{prefix}{content}\n\n"
-                except Exception:
-                    # Continue to the next file
-                    continue
+    # Stat, read and clean every matched file exactly once; without --watch,
+    # content goes back to the cache once measured and is read again when written
+    try:
+        index = index_changes(config, context_files, cache, stats,
+                              defer_content=not args.watch)
+    except ValueError as e:
+        raise SystemExit(f"Could not list changes since {config.since or 'the last run'}: {e}")
+    report_load(index, cache)
+    if (config.since is not None or config.since_last_run) and not index.removed \
+            and all(record.listed_only for record in index):
+        print(f"No changes since {config.since or 'the last run'}")
+    else:
+        emit_prompt(index, config, args.output, release=not args.watch)
+    if config.cache_dir:
+        save_run(config, index)
+    report_stats(stats, args)
+
+    if args.watch:
+        from _copy_watch import watch
+
+        def rebuild(changes):
+            stats = index.stats = RunStats(args.slowest)
+            if changes.structural:
+                with stats.phase("find_files"):
+                    files = find_files_for(config, stats)
+                changed, removed = index.sync(files)
             else:
-                clipboard_content += f"{prefix}\n"
-
-    clipboard_content = clean_newlines(clipboard_content).strip()
+                changed, removed = index.refresh(changes.paths), []
+            if not changed and not removed:
+                return
+            print(f"\nRebuilding: {len(changed)} changed, {len(removed)} removed")
+            with stats.phase("load"):
+                index.load_all(config.jobs)
+            report_load(index, cache)
+            emit_prompt(index, config, args.output, release=False)
+            report_stats(stats, args)
 
-    # Generate and format the file structure
-    structure_include_files = structure_include
-    if include:
-        structure_include_files += include
-    structure_exclude_files = structure_exclude
-    if exclude:
-        structure_exclude_files += exclude
-    files_structure = format_file_structure(
-        base_dir,
-        include_files=structure_include_files,
-        exclude_files=structure_exclude_files,
-        include_content=include_content,
-        exclude_content=exclude_content,
-        case_sensitive=case_sensitive,
-        shorten_funcs=shorten_funcs,
-        show_file_length=show_file_length,
-    )
+        watch(config.base_dir, config.exclude_files, rebuild, config.case_sensitive,
+              ignore=[os.path.abspath(args.cache_dir), os.path.abspath(args.output)],
+              debounce=args.debounce)
 
-    # Prepend system and query to the clipboard content then append instructions
-    clipboard_content_parts = []
+    if cache is not None:
+        cache.close()
 
-    if system_message:
-        clipboard_content_parts.append(f"SYSTEM\n{system_message}")
-    if instructions_message:
-        clipboard_content_parts.append(f"INSTRUCTIONS\n{instructions_message}")
-    clipboard_content_parts.append(f"QUERY\n{query_message}")
-    if INCLUDE_FILE_STRUCTURE:
-        clipboard_content_parts.append(f"FILES STRUCTURE\n{files_structure}")
-    clipboard_content_parts.append(f"FILES CONTENTS\n{clipboard_content}")
 
-    clipboard_content = "\n\n".join(clipboard_content_parts)
+def run_batch_manifest(args):
+    from _copy_batch import load_manifest, run_batch
 
-    # Copy the content to the clipboard
-    process = subprocess.Popen(
-        'pbcopy', env={'LANG': 'en_US.UTF-8'}, stdin=subprocess.PIPE)
-    process.communicate(clipboard_content.encode('utf-8'))
+    try:
+        jobs = load_manifest(args.batch, PromptConfig.from_args(args))
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Invalid batch manifest: {e}")
+    print(f"\nBatch {args.batch}: {len(jobs)} jobs")
+    stats = RunStats(args.slowest)
+    cache_dir = None if args.no_cache else args.cache_dir
+    try:
+        results = run_batch(jobs, args.jobs, cache_dir, args.slowest, stats)
+    except FileNotFoundError as e:
+        raise SystemExit(f"Cannot list the files of a batch job: {e}")
+    for result in results:
+        for path, error in result.errors:
+            print(f"Error reading {path}: {error}")
+        if result.error is not None:
+            print(f"Cannot build {result.output} ({result.name}): {result.error}")
+            continue
+        print(f"Wrote {result.output} ({result.name}): {result.files} files, "
+              f"{result.chars} chars, {result.duplicates} duplicates")
+    report_stats(stats, args)
+
+
+def find_files_for(config: PromptConfig, stats: RunStats):
+    files = find_files(config.base_dir, config.include_files, config.exclude_files,
+                       config.include_content, config.exclude_content, config.case_sensitive,
+                       stats, config.source, config.follow_symlinks)
+    if config.relevant_to is None:
+        return files
+    files, ranked = rank_files(config, files, stats)
+    print(f"\nRelevant to {config.relevant_to or config.message!r} (top {config.top_k or 'all'}):")
+    for file, score in ranked:
+        print(f"{score:8.3f}  {file}")
+    return files
+
+
+def report_load(index, cache):
+    if cache is not None:
+        print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+        cache.hits = cache.misses = 0
+        cache.commit()
+    for record in index.errors:
+        print(f"Error reading {record.path}: {record.error}")
+    binaries = index.binaries
+    if binaries:
+        print(f"Skipped {len(binaries)} binary files")
+    for record in index.excerpts:
+        print(f"Excerpted large file ({record.size} bytes): {record.path}")
+
+
+def report_stats(stats, args):
+    if not args.stats:
+        return
+    report = stats.format(args.stats)
+    if args.stats_file:
+        with open(args.stats_file, 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+        print(f"Stats written to {args.stats_file}")
+    else:
+        print(report)
+
+
+def emit_prompt(index, config, output, release=True):
+    """Streams the prompt into the output sink and prints what was written."""
+    with open_sink(output, chunked=bool(config.chunk_size)) as sink:
+        try:
+            result = build_prompt(config, sink, index, release)
+        except ValueError as e:
+            raise SystemExit(f"Cannot build the prompt: {e}")
+
+    for record in result.duplicates:
+        print(f"Identical to {record.duplicate_of}: {record.path}")
+    if config.max_tokens and not config.filenames_only:
+        print(f"Token budget {config.max_tokens}: kept {len(result.kept)}, "
+              f"shortened {len(result.shortened)}, dropped {len(result.dropped)} files")
+        for record in result.shortened:
+            print(f"Shortened to fit token budget: {record.path}")
+        for record in result.dropped:
+            print(f"Dropped to fit token budget: {record.path}")
+    if config.chunk_size:
+        print(f"Split into {len(result.chunks)} chunks of at most {config.chunk_size} {config.chunk_unit}")
+        for path in getattr(sink, "paths", []):
+            print(f"Wrote {path}")
+        for record in result.oversized:
+            print(f"Larger than a chunk, written alone: {record.path}")
+    if config.since is not None or config.since_last_run:
+        changed = sum(not record.listed_only for record in index)
+        print(f"Changed since {config.since or 'the last run'}: {changed} files, "
+              f"{len(result.removed)} removed, {len(index) - changed} listed by name only")
+        for path in result.removed:
+            print(f"Removed: {path}")
 
+    print("\n")
+    log("Number of Files:", len(index), colors=["GRAY", "DEBUG"])
+    log("Files Char Count:", index.total_length, colors=["GRAY", "SUCCESS"])
     # Print the copied content character count
-    logger.log("Prompt Char Count:", len(clipboard_content),
-               colors=["GRAY", "SUCCESS"])
+    log("Prompt Char Count:", result.chars, colors=["GRAY", "SUCCESS"])
 
     print(
-        f"\n----- FILES STRUCTURE -----\n{files_structure}\n----- END FILES STRUCTURE -----\n")
+        f"\n----- FILES STRUCTURE -----\n{result.files_structure}\n----- END FILES STRUCTURE -----\n")
 
     # Newline
     print("\n")
@@ -0,0 +1,184 @@
+import os
+import struct
+from typing import Optional
+
+INDEX_SIGNATURE = b"DIRC"
+INDEX_HEADER = struct.Struct(">4sII")
+# ctime, mtime, dev, ino, mode, uid, gid, size: ten 32-bit fields
+INDEX_STAT_SIZE = 40
+INDEX_MODE_OFFSET = 24
+INDEX_FLAG_EXTENDED = 0x4000
+INDEX_FLAG_SKIP_WORKTREE = 0x4000
+INDEX_NAME_MASK = 0x0FFF
+GITLINK_MODE = 0o160000
+SHA1_SIZE = 20
+SHA256_SIZE = 32
+
+
+def find_git_dir(base_dir) -> Optional[tuple[str, str]]:
+    """Returns (work tree root, git dir) of the repository containing base_dir, if any."""
+    path = os.path.abspath(base_dir)
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            return path, dot_git
+        if os.path.isfile(dot_git):
+            # Worktrees and submodules point at their git dir from a .git file
+            with open(dot_git, encoding="utf-8") as f:
+                line = f.readline().strip()
+            if line.startswith("gitdir:"):
+                return path, os.path.join(path, line[len("gitdir:"):].strip())
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _object_id_size(git_dir) -> int:
+    try:
+        with open(os.path.join(git_dir, "config"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip().replace(" ", "").lower() == "objectformat=sha256":
+                    return SHA256_SIZE
+    except OSError:
+        pass
+    return SHA1_SIZE
+
+
+def read_git_index(git_dir) -> list[str]:
+    """
+    Returns the paths tracked in git_dir's index (versions 2 to 4), relative
+    to the work tree root. Submodules and skip-worktree entries are left out.
+    """
+    with open(os.path.join(git_dir, "index"), "rb") as f:
+        data = f.read()
+    signature, version, count = INDEX_HEADER.unpack_from(data, 0)
+    if signature != INDEX_SIGNATURE or version not in (2, 3, 4):
+        raise ValueError(f"Unsupported git index (version {version})")
+
+    oid_size = _object_id_size(git_dir)
+    paths = []
+    previous = b""
+    offset = INDEX_HEADER.size
+    for _ in range(count):
+        entry_start = offset
+        mode = struct.unpack_from(">I", data, offset + INDEX_MODE_OFFSET)[0]
+        offset += INDEX_STAT_SIZE + oid_size
+        flags = struct.unpack_from(">H", data, offset)[0]
+        offset += 2
+        extended_flags = 0
+        if version >= 3 and flags & INDEX_FLAG_EXTENDED:
+            extended_flags = struct.unpack_from(">H", data, offset)[0]
+            offset += 2
+
+        if version == 4:
+            # Name is stored as "drop N bytes of the previous name" + suffix
+            byte = data[offset]
+            offset += 1
+            drop = byte & 0x7F
+            while byte & 0x80:
+                byte = data[offset]
+                offset += 1
+                drop = ((drop + 1) << 7) | (byte & 0x7F)
+            end = data.index(b"\0", offset)
+            name = previous[:len(previous) - drop] + data[offset:end]
+            offset = end + 1
+        else:
+            length = flags & INDEX_NAME_MASK
+            end = offset + length if length < INDEX_NAME_MASK else data.index(b"\0", offset)
+            name = data[offset:end]
+            # Entries are NUL-padded to a multiple of 8 bytes
+            offset = entry_start + ((end - entry_start) // 8 + 1) * 8
+        previous = name
+
+        if mode == GITLINK_MODE or extended_flags & INDEX_FLAG_SKIP_WORKTREE:
+            continue
+        # Conflicted paths appear once per merge stage
+        path = os.fsdecode(name)
+        if not paths or paths[-1] != path:
+            paths.append(path)
+    return paths
+
+
+def list_git_files(base_dir) -> list[str]:
+    """
+    Returns the files under base_dir that git tracks or would not ignore,
+    relative to base_dir. Uses `git ls-files` when git is installed and falls
+    back to reading .git/index directly (tracked files only).
+    """
+    import subprocess
+    try:
+        output = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=base_dir, capture_output=True, check=True).stdout
+        return sorted(set(os.fsdecode(path) for path in output.split(b"\0") if path))
+    except (OSError, subprocess.CalledProcessError) as e:
+        failure = e
+
+    found = find_git_dir(base_dir)
+    if found is None:
+        raise FileNotFoundError(f"Not a git repository: {base_dir}")
+    print(f"git ls-files failed ({failure}); reading the git index directly")
+    work_tree, git_dir = found
+    prefix = os.path.relpath(os.path.abspath(base_dir), work_tree)
+    prefix = "" if prefix == "." else prefix.replace(os.sep, "/") + "/"
+    return [os.path.join(*path[len(prefix):].split("/"))
+            for path in read_git_index(git_dir) if path.startswith(prefix)]
+
+
+def changed_since(base_dir, ref) -> tuple[set[str], set[str]]:
+    """
+    Returns (changed or added, removed) files under base_dir between ref and
+    the working tree, relative to base_dir. Untracked files that git would not
+    ignore count as added. Raises ValueError when git fails, e.g. on an
+    unknown ref.
+    """
+    import subprocess
+
+    def git(*args) -> bytes:
+        try:
+            return subprocess.run(["git", *args], cwd=base_dir,
+                                  capture_output=True, check=True).stdout
+        except OSError as e:
+            raise ValueError(f"git is not available: {e}")
+        except subprocess.CalledProcessError as e:
+            raise ValueError(e.stderr.decode(errors="replace").strip() or str(e))
+
+    fields = git("diff", "--name-status", "-z", "--no-renames", "--relative", ref, "--").split(b"\0")
+    changed, removed = set(), set()
+    for status, path in zip(fields[0::2], fields[1::2]):
+        path = os.path.normpath(os.fsdecode(path))
+        (removed if status == b"D" else changed).add(path)
+    for path in git("ls-files", "-z", "--others", "--exclude-standard").split(b"\0"):
+        if path:
+            changed.add(os.path.normpath(os.fsdecode(path)))
+    return changed, removed
+
+
+class GitTree:
+    """Directory tree of the files git lists under base_dir, walked like os.walk."""
+
+    def __init__(self, base_dir, paths=None):
+        self.base_dir = os.path.normpath(base_dir)
+        self.dirs: dict[str, tuple[list[str], list[str]]] = {"": ([], [])}
+        for path in list_git_files(base_dir) if paths is None else paths:
+            parent, name = os.path.split(path)
+            self._dir(parent)[1].append(name)
+
+    def _dir(self, rel_dir) -> tuple[list[str], list[str]]:
+        entry = self.dirs.get(rel_dir)
+        if entry is None:
+            entry = self.dirs[rel_dir] = ([], [])
+            parent, name = os.path.split(rel_dir)
+            self._dir(parent)[0].append(name)
+        return entry
+
+    def walk(self):
+        """Yields (rel_root, dirs, files) top-down like _copy_walk.walk; prune by editing dirs in place."""
+        stack = [""]
+        while stack:
+            rel_root = stack.pop()
+            sub_dirs, files = self.dirs[rel_root]
+            dirs = sorted(sub_dirs)
+            yield rel_root, dirs, sorted(files)
+            stack.extend(os.path.join(rel_root, d) for d in reversed(dirs))
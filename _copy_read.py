@@ -0,0 +1,65 @@
+import os
+import mmap
+
+# Bytes sniffed from the start of a file to tell text from binary
+SNIFF_BYTES = 8192
+# Files larger than this contribute only a head/tail excerpt (0 or None for no limit)
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+# Bytes kept from each end of an excerpted file
+EXCERPT_BYTES = 16 * 1024
+
+
+class BinaryFileError(ValueError):
+    """Raised by read_source for files whose first bytes do not look like text."""
+
+
+def looks_binary(head: bytes) -> bool:
+    """Whether the first bytes of a file contain NULs or are not valid UTF-8."""
+    if b"\0" in head:
+        return True
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sniff window is still text
+        return not (e.end == len(head) and len(head) - e.start < 4)
+    return False
+
+
+def is_excerpted(size: int, max_bytes=None) -> bool:
+    """Whether a text file of this size is read as a head/tail excerpt."""
+    return bool(max_bytes) and size > max_bytes and size > 2 * EXCERPT_BYTES
+
+
+def excerpt_text(data, size: int, excerpt_bytes=EXCERPT_BYTES) -> str:
+    """
+    Returns the first and last excerpt_bytes of data, cut back to whole lines,
+    around a marker saying how many bytes were left out.
+    """
+    head = data[:excerpt_bytes]
+    head = head[:head.rfind(b"\n") + 1] or head
+    tail = data[size - excerpt_bytes:]
+    tail = tail[tail.find(b"\n") + 1:] or tail
+    elided = size - len(head) - len(tail)
+    text = (head.decode("utf-8", "replace")
+            + f"… [{elided} bytes elided] …\n"
+            + tail.decode("utf-8", "replace"))
+    # Match the universal newlines of a text-mode read
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_source(file_path, max_bytes=None) -> tuple[str, bool]:
+    """
+    Returns (text, excerpted). Binary files are detected from their first
+    SNIFF_BYTES and raise BinaryFileError without reading the rest; files over
+    max_bytes are mmap'ed and only their head and tail are decoded.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+        if looks_binary(head):
+            raise BinaryFileError("binary file")
+        size = os.fstat(f.fileno()).st_size
+        if is_excerpted(size, max_bytes):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return excerpt_text(data, size), True
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read(), False
@@ -0,0 +1,148 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import Optional
+from _copy_read import DEFAULT_MAX_FILE_BYTES, BinaryFileError, read_source
+
+SEARCH_FILENAME = "search_index.sqlite3"
+# Bump whenever the tables or tokenize change; older indexes are rebuilt
+SEARCH_SCHEMA_VERSION = 1
+DEFAULT_TOP_K = 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words, camelCase and snake_case parts, and numbers
+TOKEN_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+STOPWORDS = frozenset("""
+    a an and are as at be but by can do for from has have if in into is it its
+    not of on or so that the their then there these this to use was were will
+    with you your
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word parts of text; identifiers are split on case and underscores."""
+    return [token for token in map(str.lower, TOKEN_RE.findall(text))
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Persistent SQLite inverted index of file contents, scored with BM25.
+
+    Documents are keyed by absolute path and re-tokenized only when their
+    mtime_ns or size changed, so updating before each search only stats the
+    candidates. Scores are computed over the given candidates alone, so one
+    index serves any include/exclude patterns.
+    """
+
+    def __init__(self, cache_dir=None):
+        import sqlite3
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.path = os.path.join(cache_dir, SEARCH_FILENAME)
+        else:
+            self.path = ":memory:"
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SEARCH_SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS postings")
+            self.conn.execute("DROP TABLE IF EXISTS docs")
+            self.conn.execute(f"PRAGMA user_version = {SEARCH_SCHEMA_VERSION}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)")
+
+    def update(self, base_dir, files, max_file_bytes=DEFAULT_MAX_FILE_BYTES) -> int:
+        """
+        Indexes the files (relative to base_dir) that are new or changed since
+        they were last indexed and drops those that no longer exist. Returns
+        the number of files (re-)tokenized.
+        """
+        known = {path: (doc, mtime_ns, size) for doc, path, mtime_ns, size
+                 in self.conn.execute("SELECT id, path, mtime_ns, size FROM docs")}
+        indexed = 0
+        for file in files:
+            path = os.path.abspath(os.path.join(base_dir, file))
+            old = known.get(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                if old is not None:
+                    self._delete(old[0])
+                continue
+            if old is not None and old[1:] == (st.st_mtime_ns, st.st_size):
+                continue
+            try:
+                text, _ = read_source(path, max_file_bytes)
+            except BinaryFileError:
+                text = ""
+            except (OSError, UnicodeDecodeError):
+                continue
+            # Path parts count as content so file and directory names match too
+            counts = Counter(tokenize(os.path.relpath(path, base_dir)))
+            counts.update(tokenize(text))
+            if old is not None:
+                self._delete(old[0])
+            doc = self.conn.execute(
+                "INSERT INTO docs (path, mtime_ns, size, length) VALUES (?, ?, ?, ?)",
+                (path, st.st_mtime_ns, st.st_size, sum(counts.values()))).lastrowid
+            self.conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                ((term, doc, tf) for term, tf in counts.items()))
+            indexed += 1
+        self.conn.commit()
+        return indexed
+
+    def _delete(self, doc):
+        self.conn.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        self.conn.execute("DELETE FROM docs WHERE id = ?", (doc,))
+
+    def search(self, query: str, base_dir, files, k: Optional[int] = DEFAULT_TOP_K) -> list[tuple[str, float]]:
+        """Returns up to k (file, BM25 score) pairs of files matching query, best first."""
+        by_path = {os.path.abspath(os.path.join(base_dir, file)): file for file in files}
+        docs = {}
+        for doc, path, length in self.conn.execute("SELECT id, path, length FROM docs"):
+            if path in by_path:
+                docs[doc] = (by_path[path], length)
+        if not docs:
+            return []
+        avg_length = sum(length for _, length in docs.values()) / len(docs) or 1.0
+
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = [(doc, tf) for doc, tf in self.conn.execute(
+                "SELECT doc, tf FROM postings WHERE term = ?", (term,)) if doc in docs]
+            if not postings:
+                continue
+            idf = math.log(1 + (len(docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * docs[doc][1] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], docs[item[0]][0]))
+        return [(docs[doc][0], score) for doc, score in ranked[:k or None]]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,214 @@
+import os
+import re
+import sys
+from typing import Optional
+
+# Clipboard commands in order of preference
+CLIPBOARD_COMMANDS = {
+    "wl-copy": ["wl-copy"],
+    "xclip": ["xclip", "-selection", "clipboard"],
+    "xsel": ["xsel", "--clipboard", "--input"],
+    "pbcopy": ["pbcopy"],
+}
+
+NEWLINES_PATTERN = re.compile(r'\n\s*\n+')
+# Written between the chunks of a --chunk-size prompt in a single stream
+PART_SEPARATOR = "\n\n----- END OF PART -----\n\n"
+# Numbered chunk files are named after this when the output is the clipboard
+DEFAULT_CHUNK_OUTPUT = "prompt.txt"
+
+
+class Sink:
+    """Destination the prompt is streamed into, section by section."""
+
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, text: str):
+        if text:
+            self.chars += len(text)
+            self._write(text)
+
+    def _write(self, text: str):
+        raise NotImplementedError
+
+    def start_part(self, part: int, total: int):
+        """Called before each chunk of a chunked prompt; parts follow each other in one stream."""
+        if part > 1:
+            self.write(PART_SEPARATOR)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StdoutSink(Sink):
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream or sys.stdout
+
+    def _write(self, text):
+        self.stream.write(text)
+
+    def close(self):
+        self.stream.flush()
+
+
+class FileSink(Sink):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def _write(self, text):
+        self.file.write(text)
+
+    def close(self):
+        self.file.close()
+
+
+class NumberedFileSink(Sink):
+    """
+    Writes each chunk of a chunked prompt to its own file: out.txt -> out.001.txt,
+    out.002.txt, ... On close, the consecutive parts numbered past the last
+    one written (left by an earlier run with more chunks) are removed.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.paths: list[str] = []
+        self.file = None
+
+    def part_path(self, part: int) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{part:03d}{ext}"
+
+    def start_part(self, part, total):
+        self._close_part()
+        self.paths.append(self.part_path(part))
+        self.file = open(self.paths[-1], 'w', encoding='utf-8')
+
+    def _write(self, text):
+        if self.file is None:
+            self.start_part(1, 1)
+        self.file.write(text)
+
+    def _close_part(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove_stale_parts(self):
+        """Removes the parts following the last one written, up to the first missing number."""
+        part = len(self.paths) + 1
+        while os.path.isfile(self.part_path(part)):
+            os.remove(self.part_path(part))
+            part += 1
+
+    def close(self):
+        self._close_part()
+        if self.paths:
+            self.remove_stale_parts()
+
+
+class PipeSink(Sink):
+    """Streams into the stdin of a command such as pbcopy, xclip or wl-copy."""
+
+    def __init__(self, command: list[str]):
+        super().__init__()
+        self.command = command
+        import subprocess
+        self.process = subprocess.Popen(
+            command, env={**os.environ, 'LANG': 'en_US.UTF-8'}, stdin=subprocess.PIPE)
+
+    def _write(self, text):
+        self.process.stdin.write(text.encode('utf-8'))
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+class MemorySink(Sink):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def _write(self, text):
+        self.parts.append(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+class NewlineCleaner:
+    """
+    Incremental clean_newlines(...).strip() in front of a sink.
+
+    Trailing whitespace of each write is held back until the next
+    non-whitespace text arrives, so runs of blank lines are never split
+    across writes and the output matches cleaning the whole text at once.
+    """
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.pending = ""
+        self.started = False
+
+    def write(self, text: str):
+        text = self.pending + text
+        tail = len(text.rstrip())
+        self.pending = text[tail:]
+        head = NEWLINES_PATTERN.sub('\n', text[:tail])
+        if not self.started:
+            head = head.lstrip()
+            self.started = bool(head)
+        self.sink.write(head)
+
+    def close(self):
+        # Whatever is still pending is trailing whitespace, which strip() drops
+        self.pending = ""
+
+
+def find_clipboard_command() -> Optional[list[str]]:
+    import shutil
+    names = list(CLIPBOARD_COMMANDS)
+    if os.environ.get("WAYLAND_DISPLAY") is None:
+        names.remove("wl-copy")
+        names.append("wl-copy")
+    for name in names:
+        if shutil.which(name):
+            return CLIPBOARD_COMMANDS[name]
+    return None
+
+
+def open_sink(target: str = "clipboard", chunked=False) -> Sink:
+    """
+    Opens a sink by name: "clipboard" (first available clipboard command),
+    "stdout" or "-", one of CLIPBOARD_COMMANDS, or a file path. With chunked,
+    file paths and the clipboard (which holds one text) become numbered files.
+    """
+    if chunked and target not in ("stdout", "-"):
+        if target == "clipboard" or target in CLIPBOARD_COMMANDS:
+            print(f"Chunks do not fit in the clipboard; writing {DEFAULT_CHUNK_OUTPUT} parts",
+                  file=sys.stderr)
+            target = DEFAULT_CHUNK_OUTPUT
+        return NumberedFileSink(target)
+    if target == "clipboard":
+        command = find_clipboard_command()
+        if command is None:
+            print("No clipboard command found "
+                  f"({', '.join(CLIPBOARD_COMMANDS)}); writing to stdout", file=sys.stderr)
+            return StdoutSink()
+        return PipeSink(command)
+    if target in ("stdout", "-"):
+        return StdoutSink()
+    if target in CLIPBOARD_COMMANDS:
+        return PipeSink(CLIPBOARD_COMMANDS[target])
+    return FileSink(target)
@@ -0,0 +1,111 @@
+import time
+import heapq
+import contextlib
+
+DEFAULT_SLOWEST_FILES = 10
+
+
+class RunStats:
+    """
+    Wall times, counters and per-file costs collected over one run.
+
+    Phases are wall-clock sections of the pipeline; cleaners and the slowest
+    files are summed per-file times, which also covers work done in pool
+    workers (so they can add up to more than the load phase with --jobs).
+    """
+
+    def __init__(self, slowest=DEFAULT_SLOWEST_FILES):
+        self.slowest = slowest
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.cleaners: dict[str, float] = {}
+        self._files: list[tuple[float, str]] = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the wall time of the with-block to the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_cleaner_times(self, timings: dict[str, float]):
+        for name, seconds in timings.items():
+            self.cleaners[name] = self.cleaners.get(name, 0.0) + seconds
+
+    def add_file(self, path, seconds):
+        """Records a file's read and clean time, keeping only the slowest N."""
+        if len(self._files) < self.slowest:
+            heapq.heappush(self._files, (seconds, path))
+        elif self._files and seconds > self._files[0][0]:
+            heapq.heapreplace(self._files, (seconds, path))
+
+    def merge(self, other: "RunStats"):
+        """Adds the stats of another run, e.g. one collected in a pool worker."""
+        for name, seconds in other.phases.items():
+            self.add_time(name, seconds)
+        for name, value in other.counters.items():
+            self.count(name, value)
+        self.add_cleaner_times(other.cleaners)
+        for seconds, path in other._files:
+            self.add_file(path, seconds)
+
+    @property
+    def slowest_files(self) -> list[tuple[float, str]]:
+        return sorted(self._files, reverse=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": self.phases,
+            "counters": self.counters,
+            "cleaners": self.cleaners,
+            "slowest_files": [{"path": path, "seconds": seconds}
+                              for seconds, path in self.slowest_files],
+        }
+
+    def format(self, fmt="text") -> str:
+        """Returns the stats as JSON or as a human-readable report."""
+        if fmt == "json":
+            import json
+            return json.dumps(self.to_dict(), indent=2)
+        lines = ["----- STATS -----", "Phases:"]
+        lines += [f"  {name:<24}{seconds * 1000:10.1f} ms"
+                  for name, seconds in self.phases.items()]
+        lines.append("Counters:")
+        lines += [f"  {name:<24}{value:10}"
+                  for name, value in self.counters.items()]
+        if self.cleaners:
+            lines.append("Cleaners:")
+            lines += [f"  {name:<24}{seconds * 1000:10.1f} ms"
+                      for name, seconds in sorted(
+                          self.cleaners.items(), key=lambda item: -item[1])]
+        if self._files:
+            lines.append(f"Slowest files ({len(self._files)}):")
+            lines += [f"  {seconds * 1000:10.1f} ms  {path}"
+                      for seconds, path in self.slowest_files]
+        lines.append("----- END STATS -----")
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile(path=None):
+    """Runs the with-block under cProfile and dumps pstats data to path, if given."""
+    if not path:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path} (python -m pstats {path})")
@@ -0,0 +1,89 @@
+import re
+import heapq
+from _copy_cleaners import shorten_python
+
+# Byte-pair encoders split text into words, numbers, punctuation and
+# whitespace before merging; long words end up as several sub-word tokens.
+# Counting regex pieces with bounded lengths approximates that in one C-level pass.
+TOKEN_PIECES = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]{1,6}| ?\d{1,3}| ?[^\s\w]{1,2}|_+|\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count of the given text."""
+    return len(TOKEN_PIECES.findall(text))
+
+
+def file_header(path: str) -> str:
+    return f"\n// {path}\n"
+
+
+def duplicate_marker(path: str) -> str:
+    """Body written in place of content identical to an earlier file's."""
+    return f"(identical to {path})"
+
+
+def fit_to_budget(records, budget: int, explicit=frozenset(), content_of=None, path_of=None):
+    """
+    Chooses which records fit in a token budget.
+
+    Records are popped from a heap ordered by (explicitly listed first,
+    then fewest tokens), which is the greedy knapsack that fits the most
+    files. A Python file that does not fit in full falls back to its
+    shorten_functions signatures. Duplicates (records with duplicate_of set)
+    only cost their marker and are kept if their original is. Returns
+    (kept, shortened, dropped) lists; shortened records have their content
+    replaced in place. content_of(record) returns content not held in
+    record.content, such as ScanIndex.content_of for deferred records;
+    path_of(record) is the path a record's header is written with.
+    """
+    content_of = content_of or (lambda record: record.content)
+    path_of = path_of or (lambda record: record.path)
+    heap = []
+    duplicates = []
+    labels = {}
+    for order, record in enumerate(records):
+        if not record.has_content:
+            continue
+        labels[record.path] = path_of(record)
+        if record.duplicate_of:
+            duplicates.append(record)
+            continue
+        cost = record.tokens + estimate_tokens(file_header(labels[record.path]))
+        heapq.heappush(heap, (record.path not in explicit, cost, order, record))
+
+    kept, shortened, dropped = [], [], []
+    remaining = budget
+    while heap:
+        _, cost, _, record = heapq.heappop(heap)
+        if cost <= remaining:
+            kept.append(record)
+            remaining -= cost
+            continue
+        if record.path.endswith(".py"):
+            short = shorten_python(content_of(record) or "")
+            short_cost = estimate_tokens(short) + \
+                estimate_tokens(file_header(labels[record.path]))
+            if short and short_cost <= remaining:
+                record.content = short
+                record.deferred = False
+                record.tokens = short_cost
+                shortened.append(record)
+                remaining -= short_cost
+                continue
+        record.content = None
+        record.deferred = False
+        dropped.append(record)
+
+    fitted = {record.path for record in kept + shortened}
+    for record in duplicates:
+        cost = estimate_tokens(file_header(labels[record.path]) + duplicate_marker(
+            labels.get(record.duplicate_of, record.duplicate_of)))
+        if record.duplicate_of in fitted and cost <= remaining:
+            kept.append(record)
+            remaining -= cost
+            continue
+        record.content = None
+        record.deferred = False
+        dropped.append(record)
+    return kept, shortened, dropped
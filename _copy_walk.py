@@ -0,0 +1,57 @@
+import os
+from _copy_matcher import join_rel
+
+
+def walk(base_dir, follow_symlinks=False):
+    """
+    Iterative os.scandir walker yielding (rel_root, dirs, files) top-down,
+    with rel_root relative to base_dir ("" for base_dir itself).
+
+    Like os.walk, callers prune by editing dirs in place before the next
+    iteration, and excluded directories are never opened. Entries are
+    classified from their DirEntry type info; only directories are stat'ed,
+    to record their (st_dev, st_ino) so each one is visited exactly once even
+    when symlinks or bind mounts form a cycle. Symlinked directories are
+    listed in dirs but only descended with follow_symlinks.
+    """
+    try:
+        st = os.stat(base_dir)
+    except OSError:
+        return
+    visited = {(st.st_dev, st.st_ino)}
+    stack = [("", base_dir)]
+    while stack:
+        rel_root, root = stack.pop()
+        dirs, files, dir_entries = [], [], {}
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry.name)
+                        dir_entries[entry.name] = entry
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            continue
+
+        yield rel_root, dirs, files
+
+        for name in reversed(dirs):
+            entry = dir_entries.get(name)
+            if entry is None:
+                continue
+            try:
+                if entry.is_symlink() and not follow_symlinks:
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                continue
+            visited.add(key)
+            stack.append((join_rel(rel_root, name), entry.path))
@@ -0,0 +1,215 @@
+import os
+import time
+import errno
+import select
+import struct
+from _copy_matcher import GlobMatcher, join_rel
+from _copy_walk import walk
+
+# inotify(7) event flags
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+STRUCTURAL_MASK = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                   | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+DEFAULT_DEBOUNCE = 0.3
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def watch_dirs(base_dir, exclude, case_sensitive=False) -> list[str]:
+    """Returns every directory under base_dir that find_files would descend into."""
+    matcher = GlobMatcher([], exclude, case_sensitive)
+    dirs = []
+    for rel_root, sub_dirs, _ in walk(base_dir):
+        dirs.append(os.path.abspath(os.path.join(base_dir, rel_root)))
+        sub_dirs[:] = [d for d in sub_dirs
+                       if not matcher.excludes(join_rel(rel_root, d), d)]
+    return dirs
+
+
+class Changes:
+    """Paths changed since the last rebuild, and whether files were added or removed."""
+
+    def __init__(self):
+        self.paths = set()
+        self.structural = False
+
+    def __bool__(self):
+        return bool(self.paths) or self.structural
+
+    def update(self, other: "Changes"):
+        self.paths |= other.paths
+        self.structural = self.structural or other.structural
+
+
+class InotifyWatcher:
+    """Linux inotify watcher over a fixed set of directories, via ctypes."""
+
+    def __init__(self, dirs, ignore=()):
+        import ctypes
+        import ctypes.util
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ignore = tuple(ignore)
+        self.wds: dict[int, str] = {}
+        self.watch(dirs)
+
+    def watch(self, dirs):
+        watched = set(self.wds.values())
+        for path in dirs:
+            if path in watched:
+                continue
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:
+                self.wds[wd] = path
+
+    def wait(self, timeout=None) -> Changes:
+        changes = Changes()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changes
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; force a full re-walk
+                changes.structural = True
+                continue
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
+            directory = self.wds.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if path.startswith(self.ignore):
+                continue
+            changes.paths.add(path)
+            if mask & STRUCTURAL_MASK:
+                changes.structural = True
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback that compares (mtime_ns, size) snapshots of the watched directories."""
+
+    def __init__(self, dirs, ignore=(), interval=DEFAULT_POLL_INTERVAL):
+        self.ignore = tuple(ignore)
+        self.interval = interval
+        self.dirs = list(dirs)
+        self.snapshot = self._snapshot()
+
+    def watch(self, dirs):
+        self.dirs = list(dirs)
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for directory in self.dirs:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.path.startswith(self.ignore):
+                            continue
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return snapshot
+
+    def wait(self, timeout=None) -> Changes:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._snapshot()
+            changes = Changes()
+            old_paths, new_paths = self.snapshot.keys(), current.keys()
+            if old_paths != new_paths:
+                changes.structural = True
+                changes.paths |= old_paths ^ new_paths
+            changes.paths |= {path for path in new_paths & old_paths
+                              if current[path] != self.snapshot[path]}
+            self.snapshot = current
+            if changes:
+                return changes
+            if deadline is not None and time.monotonic() >= deadline:
+                return changes
+            wait = self.interval if deadline is None else min(
+                self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+def create_watcher(dirs, ignore=(), poll_interval=DEFAULT_POLL_INTERVAL):
+    """Returns an inotify watcher when the platform supports it, else a polling one."""
+    try:
+        return InotifyWatcher(dirs, ignore)
+    except (OSError, AttributeError):
+        return PollingWatcher(dirs, ignore, poll_interval)
+
+
+def watch(base_dir, exclude, on_change, case_sensitive=False, ignore=(),
+          debounce=DEFAULT_DEBOUNCE, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Calls on_change(changes) after each burst of filesystem changes.
+
+    Events are collected until the tree has been quiet for `debounce`
+    seconds, so bulk operations like a git checkout trigger one rebuild.
+    """
+    watcher = create_watcher(watch_dirs(base_dir, exclude, case_sensitive),
+                             ignore, poll_interval)
+    print(f"Watching {base_dir} with {type(watcher).__name__} (Ctrl+C to stop)")
+    try:
+        while True:
+            changes = watcher.wait()
+            if not changes:
+                continue
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changes.update(more)
+            if changes.structural:
+                watcher.watch(watch_dirs(base_dir, exclude, case_sensitive))
+            on_change(changes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
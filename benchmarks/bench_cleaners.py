@@ -0,0 +1,130 @@
+"""
+Throughput and pathological-input benchmark for the file cleaners.
+
+Compares the lexer cleaners in _copy_cleaners with the regexes they
+replaced. The legacy logging regex backtracks exponentially on an unclosed
+call, so on those inputs its timings double with every extra character and
+it only runs small sizes, while the new cleaners stay linear in the input
+size. Typical Python and JS sources and a slice of the standard library
+are run at the same sizes by both.
+
+    python benchmarks/bench_cleaners.py [--budget SECONDS] [--json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _copy_cleaners import clean_source  # noqa: E402
+
+LEGACY_LOGGING_PATTERN = re.compile(
+    r'logging\.(?:info|debug|error|warning|critical|exception|log|basicConfig|getLogger|disable|shutdown)\s*\((?:[^)(]+|\((?:[^)(]+|\([^)(]*\))*\))*\)',
+    re.DOTALL
+)
+
+
+def legacy_clean(content: str) -> str:
+    content = re.sub(r'#.*', '', content)
+    content = re.sub(LEGACY_LOGGING_PATTERN, '', content)
+    return re.sub(r'\n\s*\n', '\n', content)
+
+
+def stdlib_source(n: int) -> str:
+    """The first n KB of the standard library's top-level modules."""
+    chunks = []
+    total = 0
+    lib = os.path.dirname(os.__file__)
+    for name in sorted(os.listdir(lib)):
+        if total >= n * 1024 or not name.endswith(".py"):
+            continue
+        with open(os.path.join(lib, name), encoding="utf-8", errors="replace") as f:
+            chunks.append(f.read())
+        total += len(chunks[-1])
+    return "".join(chunks)[:n * 1024]
+
+
+TYPICAL_JS = (
+    "// Fetches a user\nconst url = `${base}/users/${id}`; /* cached */\n"
+    "const re = /[/\\\\]+/g, s = 'it\\'s // not a comment';\n"
+    "logging.info(\"loaded\", url);\nreturn total / count;\n")
+PATHOLOGICAL_SIZES = [12, 14, 16, 18, 20, 22, 24, 26, 28]
+LEXER_ONLY_SIZES = [1_000, 10_000, 100_000]
+SIZES = [100, 1_000, 10_000, 100_000]
+
+# case: (input of size n, file name the lexer cleans it as, legacy sizes, lexer sizes)
+CASES = {
+    # An unclosed logging call followed by n plain characters
+    "unclosed_call": (lambda n: "logging.info(" + "a" * n, "bench.py",
+                      PATHOLOGICAL_SIZES, PATHOLOGICAL_SIZES + LEXER_ONLY_SIZES),
+    # A closed call whose arguments are n nested-looking parenthesised chunks
+    "paren_soup": (lambda n: "logging.debug(" + "x (y) " * n + "\n", "bench.py",
+                   PATHOLOGICAL_SIZES, PATHOLOGICAL_SIZES + LEXER_ONLY_SIZES),
+    # Ordinary source with n logging calls and comments
+    "typical": (lambda n: "def f(x):  # doc\n    logging.info('v=%s', (x, 1))\n    return x\n" * n,
+                "bench.py", SIZES, SIZES),
+    # Ordinary JS with n copies of strings, templates, regexes and comments
+    # (the legacy regexes only handle # comments, so they skip most of its work)
+    "typical_js": (lambda n: TYPICAL_JS * n, "bench.js", SIZES, SIZES),
+    # n KB of real Python
+    "stdlib_kb": (stdlib_source, "bench.py", [64, 512, 4096], [64, 512, 4096]),
+}
+
+
+def time_call(func, content, repeat=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(budget: float) -> list[dict]:
+    results = []
+    for case, (make, file_name, legacy_sizes, lexer_sizes) in CASES.items():
+        for name, func, sizes in (
+            ("legacy_regex", legacy_clean, legacy_sizes),
+            ("lexer", lambda c: clean_source(c, file_name), lexer_sizes),
+        ):
+            for n in sizes:
+                content = make(n)
+                # One run of the legacy regex on exponential inputs is plenty
+                pathological = name == "legacy_regex" and sizes is PATHOLOGICAL_SIZES
+                seconds = time_call(func, content, repeat=1 if pathological else 3)
+                results.append({"case": case, "cleaner": name, "n": n,
+                                "chars": len(content), "seconds": seconds})
+                if seconds > budget:
+                    # Larger inputs only get slower; stop before they hang the run
+                    results.append({"case": case, "cleaner": name, "n": None,
+                                    "chars": None, "seconds": None,
+                                    "note": f"stopped after exceeding {budget}s"})
+                    break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='Stop growing a case once one run exceeds this many seconds')
+    parser.add_argument('--json', action='store_true',
+                        help='Emit results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.budget)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for row in results:
+        if row["n"] is None:
+            print(f"{row['case']:<14} {row['cleaner']:<13} {row['note']}")
+            continue
+        print(f"{row['case']:<14} {row['cleaner']:<13} n={row['n']:<7} "
+              f"chars={row['chars']:<8} {row['seconds'] * 1000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
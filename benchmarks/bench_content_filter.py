@@ -0,0 +1,116 @@
+"""
+Content filter benchmark against the original whole-file matcher.
+
+Times ContentFilter.matches and the read + lower() + `in` matcher it
+replaced on one generated file, for growing numbers of literal include
+patterns with and without an exclude pattern, case-sensitive and not. No
+pattern occurs in the file, so both sides scan all of it. Exits 1 when
+ContentFilter is slower than the baseline by more than --tolerance.
+
+    python benchmarks/bench_content_filter.py [--size 1500000] [--json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import fnmatch
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _copy_content_filter import ContentFilter  # noqa: E402
+
+PATTERN_COUNTS = [1, 4, 16, 64, 256, 1024]
+
+
+def legacy_matches(file_path, include_patterns, exclude_patterns, case_sensitive=False):
+    """The matcher ContentFilter replaced: one lowered copy of the file, one pass per pattern."""
+    with open(file_path, 'r') as f:
+        content = f.read()
+    if not case_sensitive:
+        content = content.lower()
+    if include_patterns:
+        include_patterns = [p if case_sensitive else p.lower() for p in include_patterns]
+        if not any((fnmatch.fnmatch(content, p) if '*' in p or '?' in p else p in content)
+                   for p in include_patterns):
+            return False
+    if exclude_patterns:
+        exclude_patterns = [p if case_sensitive else p.lower() for p in exclude_patterns]
+        if any((fnmatch.fnmatch(content, p) if '*' in p or '?' in p else p in content)
+               for p in exclude_patterns):
+            return False
+    return True
+
+
+def make_file(path, size, seed=0):
+    rng = random.Random(seed)
+    words = []
+    total = 0
+    while total < size:
+        word = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 10)))
+        words.append(word)
+        total += len(word) + 1
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(" ".join(words)[:size])
+
+
+def best_time(func, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(size) -> list[dict]:
+    rng = random.Random(1)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "content.txt")
+        make_file(path, size)
+        for case_sensitive in (False, True):
+            for count in PATTERN_COUNTS:
+                # Digits never occur in the file, so no pattern matches
+                include = [f"{rng.choice(string.ascii_letters)}{i}needle" for i in range(count)]
+                # An include that matches, so the exclude side is scanned as well
+                for exclude in ([], ["0absent"]):
+                    includes = include if not exclude else include + ["*"]
+                    content_filter = ContentFilter(includes, exclude, case_sensitive)
+                    filtered = best_time(lambda: content_filter.matches(path))
+                    legacy = best_time(lambda: legacy_matches(path, includes, exclude, case_sensitive))
+                    results.append({"case_sensitive": case_sensitive, "patterns": count,
+                                    "exclude": bool(exclude), "bytes": size,
+                                    "content_filter": filtered, "baseline": legacy})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=1_500_000, help='Bytes in the scanned file')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='Allowed ratio of ContentFilter time to the baseline before failing')
+    parser.add_argument('--json', action='store_true', help='Emit results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.size)
+    slower = [row for row in results
+              if row["content_filter"] > row["baseline"] * args.tolerance]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for row in results:
+            print(f"case_sensitive={row['case_sensitive']!s:<5} patterns={row['patterns']:<4} "
+                  f"exclude={row['exclude']!s:<5} content_filter {row['content_filter'] * 1000:8.2f} ms  "
+                  f"baseline {row['baseline'] * 1000:8.2f} ms  "
+                  f"({row['baseline'] / row['content_filter']:.1f}x)")
+    if slower:
+        print(f"{len(slower)} cases slower than the baseline", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Import-time regression check for the library modules.
+
+    python benchmarks/bench_import.py [--repeat N] [--max-ms 150]
+        [--output results.json] [--baseline baseline.json]
+
+Imports each module in a fresh interpreter under `python -X importtime`,
+keeps the fastest cumulative time, and checks that importing has no side
+effects: the working directory is unchanged and none of LAZY_MODULES (only
+needed once a cache, clipboard, pool, watcher, profile or the CLI is used)
+were loaded. Exits 1 when a module is over --max-ms, slower than --threshold
+times the --baseline run, or imports a lazy module.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["_copy_for_prompt", "_copy_file_structure"]
+LAZY_MODULES = [
+    "argparse",
+    "concurrent.futures",
+    "cProfile",
+    "ctypes",
+    "jet",
+    "sqlite3",
+    "subprocess",
+]
+CHECK_SIDE_EFFECTS = (
+    "import os, sys; cwd = os.getcwd(); import {module}; "
+    "sys.stderr.write('cwd changed\\n' if os.getcwd() != cwd else '')"
+)
+
+
+def import_once(module: str) -> tuple[float, set[str], str]:
+    """Returns (cumulative import seconds, modules imported, unexpected stderr)."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(
+        filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         CHECK_SIDE_EFFECTS.format(module=module)],
+        cwd=os.path.dirname(ROOT), env=env, capture_output=True, text=True)
+    seconds = 0.0
+    imported = set()
+    other = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            seconds = int(cumulative) / 1e6
+    if result.returncode != 0:
+        other.append(f"exit status {result.returncode}")
+    return seconds, imported, "\n".join(other)
+
+
+def run(repeat: int) -> dict:
+    results = {}
+    for module in MODULES:
+        best = float("inf")
+        for _ in range(repeat):
+            seconds, imported, errors = import_once(module)
+            best = min(best, seconds)
+        results[module] = {
+            "seconds": best,
+            "lazy_imported": sorted(
+                name for name in imported
+                if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)),
+            "errors": errors,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time and import side effects")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=150.0,
+                        help="Fail when a module takes longer to import (default: 150)")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Slowdown ratio reported as a regression (default: 1.5)")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "modules": run(args.repeat)}
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("modules", {})
+
+    failures = []
+    for module, result in results["modules"].items():
+        ms = result["seconds"] * 1000
+        print(f"{module:<24} {ms:8.1f} ms", file=sys.stderr)
+        if result["errors"]:
+            failures.append(f"{module}: {result['errors']}")
+        if result["lazy_imported"]:
+            failures.append(f"{module} imports {', '.join(result['lazy_imported'])}")
+        if ms > args.max_ms:
+            failures.append(f"{module} takes {ms:.1f} ms (max {args.max_ms:.0f} ms)")
+        base = baseline.get(module)
+        if base and base["seconds"] and result["seconds"] / base["seconds"] > args.threshold:
+            failures.append(f"{module}: {base['seconds'] * 1000:.1f} -> {ms:.1f} ms "
+                            f"({result['seconds'] / base['seconds']:.2f}x)")
+    for line in failures:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
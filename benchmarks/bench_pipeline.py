@@ -0,0 +1,157 @@
+"""
+Phase benchmarks for the scan, filter, clean and render hot paths.
+
+    python benchmarks/bench_pipeline.py [--size 1k|10k|100k] [--tree DIR]
+        [--repeat N] [--output results.json] [--baseline baseline.json]
+
+Times find_files, matches_content, reading, clean_content and
+format_file_structure separately over a synthetic tree, then re-runs each
+phase under tracemalloc for its peak memory. Results are emitted as JSON so
+runs can be compared: with --baseline, phases slower than --threshold times
+the baseline are reported and the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_tree import SIZES, generate_tree  # noqa: E402
+import _copy_for_prompt as prompt  # noqa: E402
+from _copy_file_structure import (  # noqa: E402
+    ScanIndex,
+    clean_content,
+    format_file_structure,
+)
+from _copy_content_filter import ContentFilter  # noqa: E402
+from _copy_read import DEFAULT_MAX_FILE_BYTES, BinaryFileError, read_source  # noqa: E402
+
+INCLUDE = ["*.py", "*.js", "*.md", "*.json"]
+INCLUDE_CONTENT = ["logging"]
+EXCLUDE_CONTENT = ["never-present-marker"]
+
+
+def measure(func, repeat: int) -> dict:
+    """Returns the best wall time over `repeat` runs and the peak traced memory of one more."""
+    best = float("inf")
+    result = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}, result
+
+
+def run(tree: str, repeat: int) -> dict:
+    phases = {}
+
+    stats, files = measure(lambda: prompt.find_files(
+        tree, INCLUDE, prompt.exclude_files, [], []), repeat)
+    phases["find_files"] = {**stats, "items": len(files)}
+    paths = sorted(os.path.join(tree, file) for file in files)
+
+    content_filter = ContentFilter(INCLUDE_CONTENT, EXCLUDE_CONTENT)
+    stats, matched = measure(
+        lambda: sum(content_filter.matches(path) for path in paths), repeat)
+    phases["matches_content"] = {**stats, "items": matched}
+
+    def read_all():
+        texts = []
+        for path in paths:
+            try:
+                text, _ = read_source(path, DEFAULT_MAX_FILE_BYTES)
+                texts.append((path, text))
+            except (OSError, UnicodeDecodeError, BinaryFileError):
+                pass
+        return texts
+
+    stats, texts = measure(read_all, repeat)
+    phases["read"] = {**stats, "items": len(texts),
+                      "bytes": sum(len(text) for _, text in texts)}
+
+    stats, _ = measure(lambda: [clean_content(text, path, False)
+                                for path, text in texts], repeat)
+    phases["clean_content"] = {**stats, "items": len(texts)}
+
+    index = ScanIndex(tree)
+    for file in files:
+        index.add(file)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        index.load_all()
+    stats, _ = measure(lambda: format_file_structure(
+        tree, INCLUDE, prompt.exclude_files, [], [], index=index), repeat)
+    phases["format_file_structure"] = {**stats, "items": len(index)}
+    return phases
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, phase in results["phases"].items():
+        base = baseline.get("phases", {}).get(name)
+        if not base:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if base[metric] and phase[metric] / base[metric] > threshold:
+                regressions.append(
+                    f"{name} {metric}: {base[metric]:.4g} -> {phase[metric]:.4g} "
+                    f"({phase[metric] / base[metric]:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scan/clean/render phases")
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tree", help="Directory for the synthetic tree (reused between runs)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Slowdown ratio reported as a regression (default: 1.2)")
+    args = parser.parse_args()
+
+    tree = args.tree or os.path.join(
+        tempfile.gettempdir(), f"copy_for_prompt_bench_{args.size}_{args.seed}")
+    manifest = generate_tree(tree, SIZES[args.size], args.seed)
+
+    results = {
+        "tree": {**manifest, "path": tree},
+        "python": platform.python_version(),
+        "phases": run(tree, args.repeat),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    for name, phase in results["phases"].items():
+        print(f"{name:<22} {phase['seconds'] * 1000:10.1f} ms "
+              f"{phase['peak_bytes'] / 1024 / 1024:8.1f} MiB  items={phase['items']}",
+              file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Load test for the /stream SSE endpoint, on localhost only.
+
+    python benchmarks/bench_stream.py [--clients 50] [--lines 100000]
+        [--rate 100000] [--size 64] [--url http://127.0.0.1:3001]
+        [--output results.json]
+
+Starts server/stream_server.py on a free port (or targets --url, e.g. the
+Node server, with --server-pid for its memory), opens --clients concurrent
+SSE connections, and has each one run benchmarks/line_generator.py at
+--rate lines per second. Every received line is checked against its
+sequence number and timestamp, and the run reports:
+
+- throughput in lines and bytes per second over all clients
+- p50/p99/max end-to-end latency, from the generator writing a line to the
+  client parsing it
+- lines dropped (never received), duplicated, reconnects and failed clients
+- the server's CPU time and its peak and final RSS, sampled every
+  --sample-interval
+
+All clients share this process, and the generators, server and harness all
+share the machine's cores: compare the harness and server CPU times in the
+report against the elapsed time to see which one is saturated.
+Clients dropped by the server resume with Last-Event-ID like EventSource, so
+the reconnect count shows how often slow-client backpressure kicked in.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shlex
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "server", "stream_server.py")
+GENERATOR = os.path.join(ROOT, "benchmarks", "line_generator.py")
+READ_CHUNK = 64 * 1024
+
+
+class ClientResult:
+    """Lines one SSE connection received, checked against the generator's sequence."""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.seen = bytearray(expected + 1)
+        self.received = 0
+        self.duplicated = 0
+        self.bytes = 0
+        self.latencies_ns: list[int] = []
+        self.last_event_id = None
+        self.reconnects = 0
+        self.error = None
+
+    def add(self, line: bytes):
+        seq, sent_ns, _ = line.split(b" ", 2)
+        seq = int(seq)
+        self.received += 1
+        self.bytes += len(line) + 1
+        if self.seen[seq]:
+            self.duplicated += 1
+        self.seen[seq] = 1
+        self.latencies_ns.append(time.time_ns() - int(sent_ns))
+
+    @property
+    def dropped(self) -> int:
+        return self.expected - sum(self.seen)
+
+
+async def run_client(host, port, command, expected, timeout, max_reconnects) -> ClientResult:
+    """
+    Streams one run to its end. Like EventSource, a connection closed before
+    the "end" event is reopened with Last-Event-ID, up to max_reconnects times.
+    """
+    result = ClientResult(expected)
+    last_event_id = None
+    while True:
+        try:
+            ended = await stream_once(host, port, command, result, last_event_id, timeout)
+        except asyncio.TimeoutError:
+            result.error = f"no data for {timeout}s"
+            return result
+        except (OSError, ValueError, IndexError) as e:
+            result.error = f"{type(e).__name__}: {e}"
+            return result
+        if ended or result.error:
+            return result
+        last_event_id = result.last_event_id
+        if last_event_id is None or result.reconnects >= max_reconnects:
+            result.error = "connection closed before the end event"
+            return result
+        result.reconnects += 1
+
+
+async def stream_once(host, port, command, result: ClientResult, last_event_id, timeout) -> bool:
+    """Reads one SSE connection into result; returns whether the run ended."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        resume = f"Last-Event-ID: {last_event_id}\r\n" if last_event_id else ""
+        writer.write(f"GET /stream?command={quote(command)} HTTP/1.1\r\n"
+                     f"Host: {host}:{port}\r\nAccept: text/event-stream\r\n{resume}\r\n".encode())
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        if b" 204 " in status:
+            return True
+        if b" 200 " not in status:
+            result.error = status.decode("latin-1").strip() or "no response"
+            return False
+        await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        pending = b""
+        while True:
+            # Reading whole chunks keeps the harness cheaper than the server
+            chunk = await asyncio.wait_for(reader.read(READ_CHUNK), timeout)
+            if not chunk:
+                return False
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                if line.startswith(b"data: ") and line[6:7].isdigit():
+                    result.add(line[6:].rstrip(b"\r"))
+                elif line.startswith(b"id: "):
+                    result.last_event_id = line[4:].strip().decode()
+                elif line.startswith(b"event: end"):
+                    return True
+    finally:
+        writer.close()
+
+
+def read_cpu_seconds(pid) -> float:
+    """User plus system CPU time of pid, 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def read_rss(pid) -> int:
+    """Resident set size of pid in bytes, 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+async def sample_rss(pid, interval, samples: list[int]):
+    while True:
+        samples.append(read_rss(pid))
+        await asyncio.sleep(interval)
+
+
+def percentile(values: list[int], fraction: float) -> int:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+async def load_test(host, port, args, server_pid=None) -> dict:
+    command = shlex.join([sys.executable, GENERATOR, "--lines", str(args.lines),
+                          "--rate", str(args.rate), "--size", str(args.size)])
+    samples: list[int] = []
+    sampler = (asyncio.ensure_future(sample_rss(server_pid, args.sample_interval, samples))
+               if server_pid else None)
+    cpu_start = time.process_time()
+    server_cpu_start = read_cpu_seconds(server_pid) if server_pid else 0.0
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_client(host, port, command, args.lines, args.timeout, args.max_reconnects)
+        for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    server_cpu = read_cpu_seconds(server_pid) - server_cpu_start if server_pid else None
+    if sampler is not None:
+        sampler.cancel()
+        samples.append(read_rss(server_pid))
+
+    latencies = sorted(latency for result in results for latency in result.latencies_ns)
+    received = sum(result.received for result in results)
+    received_bytes = sum(result.bytes for result in results)
+    return {
+        "clients": args.clients,
+        "lines_per_client": args.lines,
+        "rate_per_client": args.rate,
+        "line_bytes": args.size,
+        "elapsed_seconds": elapsed,
+        "harness_cpu_seconds": cpu,
+        "server_cpu_seconds": server_cpu,
+        "lines_received": received,
+        "lines_per_second": received / elapsed if elapsed else 0.0,
+        "bytes_per_second": received_bytes / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) / 1e6,
+            "p99": percentile(latencies, 0.99) / 1e6,
+            "max": (latencies[-1] if latencies else 0) / 1e6,
+        },
+        "dropped": sum(result.dropped for result in results if not result.error),
+        "duplicated": sum(result.duplicated for result in results),
+        "reconnects": sum(result.reconnects for result in results),
+        "failed_clients": [result.error for result in results if result.error],
+        "server_rss_bytes": {
+            "peak": max(samples, default=0),
+            "final": samples[-1] if samples else 0,
+        },
+        "harness_peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, extra_args) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, SERVER, "--port", str(port), *extra_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with status {server.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise SystemExit("Server did not start listening within 10s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /stream SSE endpoint")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=100_000, help="Lines per client (default: 100000)")
+    parser.add_argument("--rate", type=float, default=100_000,
+                        help="Lines per second per client, 0 for unthrottled (default: 100000)")
+    parser.add_argument("--size", type=int, default=64, help="Bytes per line (default: 64)")
+    parser.add_argument("--url", help="Target a running server instead of starting server/stream_server.py")
+    parser.add_argument("--server-pid", type=int, help="Pid of the --url server, to sample its RSS")
+    parser.add_argument("--server-args", default="",
+                        help="Extra options for the started server, e.g. \"--batch-lines 512\"")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="Seconds without data before a client counts as failed (default: 30)")
+    parser.add_argument("--max-reconnects", type=int, default=10,
+                        help="Times a client resumes with Last-Event-ID after the server drops it (default: 10)")
+    parser.add_argument("--sample-interval", type=float, default=0.1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        if url.hostname not in ("127.0.0.1", "localhost", "::1"):
+            parser.error("--url must point at localhost")
+        host, port, server_pid = url.hostname, url.port or 80, args.server_pid
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = start_server(port, shlex.split(args.server_args))
+        server_pid = server.pid
+
+    try:
+        report = asyncio.run(load_test(host, port, args, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {"python": platform.python_version(), "load": report}
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    latency = report["latency_ms"]
+    print(f"{report['clients']} clients: {report['lines_per_second']:,.0f} lines/s "
+          f"({report['bytes_per_second'] / 1024 / 1024:.1f} MiB/s), latency p50 "
+          f"{latency['p50']:.1f} ms p99 {latency['p99']:.1f} ms, dropped {report['dropped']}, "
+          f"duplicated {report['duplicated']}, reconnects {report['reconnects']}, failed {len(report['failed_clients'])}, "
+          f"server RSS peak {report['server_rss_bytes']['peak'] / 1024 / 1024:.1f} MiB",
+          file=sys.stderr)
+    if report["failed_clients"] or report["dropped"] or report["duplicated"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Deterministic stand-in command for the /stream load test.
+
+    python benchmarks/line_generator.py [--lines 100000] [--rate 100000]
+        [--size 64] [--seed 0]
+
+Prints --lines lines at --rate lines per second (0 for as fast as possible).
+Each line is "<seq> <time_ns> <payload>": seq counts from 1, time_ns is the
+wall clock when the line was written (so a client on the same host can
+measure end-to-end latency), and the payload pads the line to --size bytes
+with seeded, always identical characters.
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+# Lines are written in ticks of at most this many seconds
+TICK = 0.001
+
+
+def payload(size: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice(string.ascii_letters) for _ in range(size))
+
+
+def generate(lines: int, rate: float, size: int, seed: int, out=None):
+    out = out if out is not None else sys.stdout.buffer
+    # "<seq> <time_ns> " takes about 30 of the size bytes
+    pad = payload(max(1, size - 30), seed)
+    start = time.perf_counter()
+    sent = 0
+    while sent < lines:
+        elapsed = time.perf_counter() - start
+        due = lines if not rate else min(lines, int(elapsed * rate) + 1)
+        if due <= sent:
+            time.sleep(max(0.0, min(TICK, (sent + 1) / rate - elapsed)))
+            continue
+        now = time.time_ns()
+        out.write("".join(f"{seq} {now} {pad}\n" for seq in range(sent + 1, due + 1)).encode())
+        out.flush()
+        sent = due
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print timestamped lines at a fixed rate")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--rate", type=float, default=100_000,
+                        help="Lines per second, 0 for unthrottled (default: 100000)")
+    parser.add_argument("--size", type=int, default=64, help="Bytes per line (default: 64)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        generate(args.lines, args.rate, args.size, args.seed)
+    except BrokenPipeError:
+        # The server killed the stream; don't print a traceback on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Deterministic synthetic source trees for the benchmarks.
+
+    python benchmarks/synthetic_tree.py OUT_DIR [--size 1k|10k|100k] [--seed N]
+
+The same size and seed always produce byte-identical trees:
+- FILE_COUNT source files (.py, .js, .md, .json) spread over nested packages
+- a deep node_modules-style tree that the default exclude list prunes
+- one large single file
+- files full of (unclosed) logging calls that stress the cleaners
+"""
+import os
+import json
+import random
+import argparse
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+FILES_PER_DIR = 50
+NODE_MODULES_DEPTH = 6
+NODE_MODULES_FANOUT = 3
+NODE_MODULES_FILES = 20
+LARGE_FILE_BYTES = 16 * 1024 * 1024
+PATHOLOGICAL_FILES = 10
+MARKER = ".synthetic_tree.json"
+
+WORDS = ["alpha", "beta", "gamma", "delta", "value", "item", "result",
+         "config", "handler", "request", "response", "index", "cache"]
+
+
+def _python_source(rng: random.Random, functions: int) -> str:
+    lines = ["import logging", ""]
+    for i in range(functions):
+        name = f"{rng.choice(WORDS)}_{i}"
+        lines += [
+            f"def {name}(x, y=({i}, {i + 1})) -> int:",
+            f"    # compute {rng.choice(WORDS)}",
+            f"    logging.info('{name} %s', (x, y))",
+            f"    return x + {rng.randint(0, 100)}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _js_source(rng: random.Random, functions: int) -> str:
+    lines = []
+    for i in range(functions):
+        name = f"{rng.choice(WORDS)}{i}"
+        lines += [
+            f"// {rng.choice(WORDS)} helper",
+            f"export function {name}(a, b) {{",
+            f"  const url = \"http://example.com/{name}#frag\"; /* inline */",
+            f"  return `${{a}}-${{b}}-{rng.randint(0, 100)}`;",
+            "}",
+        ]
+    return "\n".join(lines)
+
+
+def _source(rng: random.Random, ext: str) -> str:
+    functions = rng.randint(1, 20)
+    if ext == ".py":
+        return _python_source(rng, functions)
+    if ext == ".js":
+        return _js_source(rng, functions)
+    if ext == ".json":
+        return json.dumps({w: rng.randint(0, 1000) for w in WORDS}, indent=2)
+    return "\n".join(f"# {rng.choice(WORDS)}\n\n{' '.join(rng.choices(WORDS, k=40))}"
+                     for _ in range(functions))
+
+
+def _write(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate_tree(root: str, file_count: int, seed: int = 0) -> dict:
+    """Writes the tree under root (reusing it if already generated) and returns its manifest."""
+    manifest = {"file_count": file_count, "seed": seed}
+    marker = os.path.join(root, MARKER)
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == manifest:
+                return manifest
+        raise FileExistsError(f"{root} holds a different synthetic tree")
+
+    rng = random.Random(seed)
+    for i in range(file_count):
+        ext = rng.choice([".py", ".py", ".js", ".js", ".md", ".json"])
+        package = i // (FILES_PER_DIR * FILES_PER_DIR)
+        module = (i // FILES_PER_DIR) % FILES_PER_DIR
+        _write(os.path.join(root, "src", f"pkg_{package:03d}", f"mod_{module:02d}",
+                            f"file_{i:06d}{ext}"), _source(rng, ext))
+
+    def node_modules(path: str, depth: int):
+        for j in range(NODE_MODULES_FILES):
+            _write(os.path.join(path, f"dep_{j}.js"), _js_source(rng, 3))
+        if depth < NODE_MODULES_DEPTH:
+            for k in range(NODE_MODULES_FANOUT):
+                node_modules(os.path.join(path, f"lib_{k}", "node_modules"), depth + 1)
+
+    node_modules(os.path.join(root, "node_modules"), 1)
+
+    chunk = _python_source(random.Random(seed), 200)
+    with open(os.path.join(root, "src", "large_module.py"), "w", encoding="utf-8") as f:
+        written = 0
+        while written < LARGE_FILE_BYTES:
+            written += f.write(chunk)
+
+    for i in range(PATHOLOGICAL_FILES):
+        _write(os.path.join(root, "src", "pathological", f"logs_{i}.py"),
+               "logging.debug(" + "x (y) " * 2000 + "\n" + "logging.info(" + "a" * 5000)
+
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic source tree")
+    parser.add_argument("out_dir")
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_tree(args.out_dir, SIZES[args.size], args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,16 +22,26 @@ function App() {
       `http://localhost:3001/stream?command=${encodeURIComponent(command)}`
     );
 
+    // Event ids are only sent by the Python server, which can resume a run
+    let resumable = false;
+
+    // The Python server batches lines into one event, separated by newlines
     eventSource.onmessage = (event) => {
-      setLogs((prevLogs) => [...prevLogs, event.data]);
+      resumable = resumable || event.lastEventId !== "";
+      setLogs((prevLogs) => [...prevLogs, ...event.data.split("\n")]);
     };
 
+    // Sent once the command has exited, so the browser does not reconnect
+    eventSource.addEventListener("end", () => eventSource.close());
+
     eventSource.onerror = () => {
+      // EventSource reconnects by itself, sending Last-Event-ID to resume
+      if (resumable && eventSource.readyState === EventSource.CONNECTING) return;
+      eventSource.close();
       setLogs((prevLogs) => [
         ...prevLogs,
         "Error connecting to the server. Please try again.",
       ]);
-      eventSource.close();
     };
   };
 
@@ -0,0 +1,445 @@
+"""
+asyncio implementation of the /stream SSE endpoint of server.js.
+
+    python server/stream_server.py [--port 3001] [--batch-lines 256]
+        [--flush-interval 0.02] [--ring-lines 10000]
+
+GET /stream?command=... runs the command with create_subprocess_exec and
+streams its stdout and stderr lines as Server-Sent Events:
+
+- Lines are coalesced into one frame per --flush-interval, --batch-lines or
+  --batch-bytes, whichever comes first; every line is a "data:" field, so
+  event.data holds the batch joined by newlines.
+- Each client reads through a bounded queue of pipe reads and each write
+  waits for the transport to drain, so a slow client stops the command's pipes from being
+  read instead of growing buffers. A client stalled for --slow-client-timeout
+  is disconnected and can resume.
+- Each run keeps its last --ring-lines lines. Frame ids are "<run>:<seq>", so
+  a reconnecting EventSource (which sends Last-Event-ID) resumes the same run
+  where it left off. Runs without clients are killed after --resume-grace.
+- The end of a run is sent as an "end" event after the exit status line.
+"""
+import asyncio
+import itertools
+import logging
+import secrets
+import shlex
+from collections import deque
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 3001
+DEFAULT_BATCH_LINES = 256
+DEFAULT_BATCH_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.02
+DEFAULT_QUEUE_READS = 64
+DEFAULT_RING_LINES = 10000
+DEFAULT_SLOW_CLIENT_TIMEOUT = 5.0
+DEFAULT_RESUME_GRACE = 30.0
+DEFAULT_KEEPALIVE = 15.0
+# Bytes read from a command's pipe at a time
+READ_CHUNK = 64 * 1024
+# Milliseconds EventSource waits before reconnecting
+RETRY_MS = 1000
+
+logger = logging.getLogger("stream_server")
+
+
+class CommandError(ValueError):
+    """Raised when a /stream command cannot be parsed or started."""
+
+
+class Subscriber:
+    """
+    One connected client: lines to replay, then a bounded queue of live
+    lines, queued as one list of (seq, line) per pipe read.
+    """
+
+    def __init__(self, replay, queue_reads):
+        self.replay = replay
+        self.queue: asyncio.Queue = asyncio.Queue(queue_reads)
+        self.closed = False
+        # Set when the client fell too far behind and must reconnect to resume
+        self.overflowed = False
+        self.sender: Optional[asyncio.Task] = None
+
+    def close(self, overflowed=False):
+        """Ends the subscription once the queued lines (none, if overflowed) are sent."""
+        self.closed = True
+        self.overflowed = overflowed
+        if overflowed and self.sender is not None:
+            # The sender is likely blocked on a full transport: stop it outright
+            self.sender.cancel()
+            return
+        if not self.queue.full():
+            # Wakes a sender waiting on the empty queue
+            self.queue.put_nowait(None)
+
+
+class Run:
+    """A running (or recently finished) command and the ring buffer of its output."""
+
+    def __init__(self, run_id, argv, ring_lines, queue_reads, slow_client_timeout):
+        self.id = run_id
+        self.argv = argv
+        self.ring: deque[tuple[int, str]] = deque(maxlen=ring_lines)
+        self.seq = 0
+        self.queue_reads = queue_reads
+        self.slow_client_timeout = slow_client_timeout
+        self.subscribers: set[Subscriber] = set()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.exit_code: Optional[int] = None
+        self.done = False
+        self.expiry: Optional[asyncio.TimerHandle] = None
+        self.pump_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.argv, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        self.pump_task = asyncio.ensure_future(self.pump())
+
+    async def pump(self):
+        await asyncio.gather(self.read_lines(self.process.stdout),
+                             self.read_lines(self.process.stderr))
+        self.exit_code = await self.process.wait()
+        await self.publish([f"Process exited with code {self.exit_code}"])
+        self.done = True
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        logger.info("Run %s exited with code %s after %d lines",
+                    self.id, self.exit_code, self.seq)
+
+    async def read_lines(self, stream: asyncio.StreamReader):
+        """Reads the pipe in chunks and publishes the non-blank lines of each."""
+        pending = b""
+        while True:
+            chunk = await stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            *lines, pending = (pending + chunk).split(b"\n")
+            lines = [line.rstrip(b"\r").decode("utf-8", "replace")
+                     for line in lines if line.strip()]
+            if lines:
+                await self.publish(lines)
+        if pending.strip():
+            await self.publish([pending.decode("utf-8", "replace")])
+
+    async def publish(self, lines: list[str]):
+        """Numbers lines, keeps them in the ring and queues them for every client."""
+        items = list(zip(range(self.seq + 1, self.seq + 1 + len(lines)), lines))
+        self.seq += len(lines)
+        self.ring.extend(items)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(items)
+            except asyncio.QueueFull:
+                # Backpressure: stop reading the command until this client catches up
+                try:
+                    await asyncio.wait_for(subscriber.queue.put(items), self.slow_client_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning("Run %s: disconnecting a client stalled for %.1fs",
+                                   self.id, self.slow_client_timeout)
+                    self.unsubscribe(subscriber)
+                    subscriber.close(overflowed=True)
+
+    def subscribe(self, last_seq=0) -> Subscriber:
+        """Subscribes a client that has seen lines up to last_seq."""
+        replay = []
+        first_seq = self.ring[0][0] if self.ring else self.seq + 1
+        if last_seq + 1 < first_seq:
+            replay.append((first_seq - 1, f"[{first_seq - 1 - last_seq} earlier lines are no longer buffered]"))
+        start = max(0, last_seq + 1 - first_seq)
+        replay.extend(itertools.islice(self.ring, start, None))
+        subscriber = Subscriber(replay, self.queue_reads)
+        if self.done:
+            subscriber.close()
+        else:
+            self.subscribers.add(subscriber)
+        if self.expiry is not None:
+            self.expiry.cancel()
+            self.expiry = None
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+
+
+class StreamServer:
+    """Serves /stream and keeps runs resumable between reconnects."""
+
+    def __init__(self, batch_lines=DEFAULT_BATCH_LINES, batch_bytes=DEFAULT_BATCH_BYTES,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, queue_reads=DEFAULT_QUEUE_READS,
+                 ring_lines=DEFAULT_RING_LINES, slow_client_timeout=DEFAULT_SLOW_CLIENT_TIMEOUT,
+                 resume_grace=DEFAULT_RESUME_GRACE, keepalive=DEFAULT_KEEPALIVE):
+        self.batch_lines = batch_lines
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.queue_reads = queue_reads
+        self.ring_lines = ring_lines
+        self.slow_client_timeout = slow_client_timeout
+        self.resume_grace = resume_grace
+        self.keepalive = keepalive
+        self.runs: dict[str, Run] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, target, headers = request
+            url = urlsplit(target)
+            if method == "OPTIONS":
+                await respond(writer, 204, "")
+            elif method != "GET" or url.path != "/stream":
+                await respond(writer, 404, "Not found")
+            else:
+                await self.stream(reader, writer, parse_qs(url.query), headers)
+        except ConnectionError:
+            pass
+        except Exception:
+            logger.exception("Error handling request")
+        finally:
+            writer.close()
+
+    async def stream(self, reader, writer, query, headers):
+        run, last_seq = self.resumable_run(headers.get("last-event-id", ""))
+        if run is None:
+            command = query.get("command", [""])[0]
+            if not command.strip():
+                await respond(writer, 400, "Error: 'command' query parameter is required")
+                return
+            try:
+                run = await self.start_run(command)
+            except CommandError as e:
+                await start_stream(writer)
+                writer.write(f"data: {e}\n\nevent: end\ndata: \n\n".encode())
+                await writer.drain()
+                return
+        elif run.done and last_seq >= run.seq:
+            # Nothing left to send: 204 stops EventSource from reconnecting
+            await respond(writer, 204, "")
+            return
+
+        subscriber = run.subscribe(last_seq)
+        logger.debug("Client %s run %s from line %d",
+                     writer.get_extra_info("peername"), run.id, last_seq + 1)
+        await start_stream(writer)
+        sender = subscriber.sender = asyncio.ensure_future(
+            self.send_frames(writer, run, subscriber))
+        # EOF on the request side means the client went away
+        closed = asyncio.ensure_future(reader.read(1))
+        try:
+            await asyncio.wait({sender, closed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sender, closed):
+                task.cancel()
+            await asyncio.gather(sender, closed, return_exceptions=True)
+            run.unsubscribe(subscriber)
+            if subscriber.overflowed:
+                # Drop unsent frames; the client resumes from its last complete frame
+                writer.transport.abort()
+            logger.debug("Client %s left run %s", writer.get_extra_info("peername"), run.id)
+            if not run.subscribers:
+                self.schedule_expiry(run)
+
+    def resumable_run(self, last_event_id) -> tuple[Optional[Run], int]:
+        run_id, _, seq = last_event_id.partition(":")
+        run = self.runs.get(run_id)
+        if run is None or not seq.isdigit():
+            return None, 0
+        return run, int(seq)
+
+    async def start_run(self, command) -> Run:
+        try:
+            argv = shlex.split(command)
+        except ValueError as e:
+            raise CommandError(f"Invalid command: {e}")
+        run = Run(secrets.token_urlsafe(6), argv, self.ring_lines,
+                  self.queue_reads, self.slow_client_timeout)
+        try:
+            await run.start()
+        except OSError as e:
+            logger.warning("Could not start %r: %s", command, e)
+            raise CommandError(f"Could not start command: {e}")
+        self.runs[run.id] = run
+        logger.info("Run %s started (pid %s): %s", run.id, run.process.pid, command)
+        return run
+
+    def schedule_expiry(self, run: Run):
+        def expire():
+            if run.subscribers:
+                return
+            run.kill()
+            self.runs.pop(run.id, None)
+            logger.info("Run %s expired", run.id)
+        if run.expiry is not None:
+            run.expiry.cancel()
+        run.expiry = asyncio.get_running_loop().call_later(self.resume_grace, expire)
+
+    async def send_frames(self, writer: asyncio.StreamWriter, run: Run, subscriber: Subscriber):
+        """Writes batched frames until the run ends or the subscriber is closed."""
+        loop = asyncio.get_running_loop()
+        while True:
+            lines = await self.next_lines(subscriber, self.keepalive)
+            if lines is False:
+                writer.write(b": keepalive\n\n")
+                await writer.drain()
+                continue
+            batch = []
+            size = 0
+            deadline = loop.time() + self.flush_interval
+            # Coalesce pipe reads until a frame is full or the flush interval is up
+            while lines:
+                batch.extend(lines)
+                size += sum(len(line) for _, line in lines)
+                if len(batch) >= self.batch_lines or size >= self.batch_bytes:
+                    break
+                lines = await self.next_lines(subscriber, deadline - loop.time())
+            if batch:
+                writer.write(format_frames(run.id, batch, self.batch_lines, self.batch_bytes))
+                # Transport backpressure: wait until the client has read the frames
+                await writer.drain()
+            if lines is None:
+                if not subscriber.overflowed:
+                    writer.write(f"id: {run.id}:{run.seq}\nevent: end\ndata: {run.exit_code}\n\n".encode())
+                    await writer.drain()
+                return
+
+    @staticmethod
+    async def next_lines(subscriber: Subscriber, timeout):
+        """Returns the next list of (seq, line), None at the end, or False after timeout."""
+        if subscriber.replay:
+            lines, subscriber.replay = subscriber.replay, []
+            return lines
+        try:
+            return subscriber.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            if subscriber.closed:
+                return None
+        if timeout <= 0:
+            return False
+        try:
+            return await asyncio.wait_for(subscriber.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def close(self):
+        for run in self.runs.values():
+            run.kill()
+
+
+def format_frames(run_id, batch, max_lines, max_bytes) -> bytes:
+    """
+    SSE events of at most max_lines lines or about max_bytes each: a data
+    field per line and the id of the event's last line.
+    """
+    frames = []
+    start = 0
+    while start < len(batch):
+        end = min(len(batch), start + max_lines)
+        size = 0
+        for i in range(start, end):
+            size += len(batch[i][1])
+            if size >= max_bytes:
+                end = i + 1
+                break
+        lines = batch[start:end]
+        frames.append(f"id: {run_id}:{lines[-1][0]}\ndata: "
+                      + "\ndata: ".join(line for _, line in lines) + "\n\n")
+        start = end
+    return "".join(frames).encode("utf-8")
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Returns (method, target, lowercased headers) of a request, or None on EOF."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = request_line.split(" ", 2)
+    headers = {}
+    for line in header_lines:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+CORS_HEADERS = "Access-Control-Allow-Origin: *\r\nAccess-Control-Allow-Headers: Last-Event-ID\r\n"
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found"}
+
+
+async def respond(writer: asyncio.StreamWriter, status, body: str):
+    data = body.encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n{CORS_HEADERS}"
+        f"Content-Type: text/plain; charset=utf-8\r\nContent-Length: {len(data)}\r\n"
+        f"Connection: close\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+
+
+async def start_stream(writer: asyncio.StreamWriter):
+    writer.write(
+        f"HTTP/1.1 200 OK\r\n{CORS_HEADERS}"
+        "Content-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+        f"Connection: keep-alive\r\n\r\nretry: {RETRY_MS}\n\n".encode("latin-1"))
+    await writer.drain()
+
+
+async def serve(host, port, server: StreamServer):
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"Server running on http://localhost:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream command output over Server-Sent Events.")
+    parser.add_argument('-H', '--host', default=DEFAULT_HOST,
+                        help=f'Address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('-bl', '--batch-lines', type=int, default=DEFAULT_BATCH_LINES,
+                        help=f'Most lines per SSE frame (default: {DEFAULT_BATCH_LINES})')
+    parser.add_argument('-bb', '--batch-bytes', type=int, default=DEFAULT_BATCH_BYTES,
+                        help=f'Bytes of output after which a frame is sent (default: {DEFAULT_BATCH_BYTES})')
+    parser.add_argument('-fi', '--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help=f'Seconds a frame waits for more lines (default: {DEFAULT_FLUSH_INTERVAL})')
+    parser.add_argument('-qr', '--queue-reads', type=int, default=DEFAULT_QUEUE_READS,
+                        help=f'Pipe reads (up to 64 KB each) queued per client before the command is paused '
+                             f'(default: {DEFAULT_QUEUE_READS})')
+    parser.add_argument('-rl', '--ring-lines', type=int, default=DEFAULT_RING_LINES,
+                        help=f'Lines kept per run for resuming clients (default: {DEFAULT_RING_LINES})')
+    parser.add_argument('--slow-client-timeout', type=float, default=DEFAULT_SLOW_CLIENT_TIMEOUT,
+                        help=f'Seconds a full client queue may pause the command before the client is dropped (default: {DEFAULT_SLOW_CLIENT_TIMEOUT})')
+    parser.add_argument('--resume-grace', type=float, default=DEFAULT_RESUME_GRACE,
+                        help=f'Seconds a run without clients is kept for resuming (default: {DEFAULT_RESUME_GRACE})')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Log every run and client at debug level')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+    server = StreamServer(args.batch_lines, args.batch_bytes, args.flush_interval,
+                          args.queue_reads, args.ring_lines, args.slow_client_timeout,
+                          args.resume_grace)
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()